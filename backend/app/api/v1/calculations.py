@@ -12,7 +12,9 @@ from app.schemas.calculation import (
     CalculationListResponse,
     CalculationResultResponse,
     CalculationStatus,
-    DateFilterRequest
+    DateFilterRequest,
+    SweepRequest,
+    SweepStatusResponse
 )
 from app.api.v1.users import get_current_active_user
 from app.models.user import User
@@ -359,7 +361,6 @@ def list_calculations(
     
     from sqlalchemy.orm import load_only
     from fastapi.responses import JSONResponse
-    import json
     from datetime import datetime
     
     # Build base query with only needed columns for lightweight mode
@@ -597,13 +598,27 @@ def recalculate(
     
     db.commit()
     
-    # Start calculation in background
-    background_tasks.add_task(
-        run_calculation_task,
-        calculation_id,
-        calculation.input_params,
-        current_user.id
-    )
+    # Start calculation in background, parameter sweep runs again as sweep
+    sweep_grid = (calculation.input_metadata or {}).get("sweep_grid")
+    if sweep_grid:
+        calculation.progress = 0
+        calculation.input_metadata = {**calculation.input_metadata, "points_done": 0}
+        db.commit()
+        
+        background_tasks.add_task(
+            run_sweep_task,
+            calculation_id,
+            calculation.input_params,
+            sweep_grid,
+            current_user.id
+        )
+    else:
+        background_tasks.add_task(
+            run_calculation_task,
+            calculation_id,
+            calculation.input_params,
+            current_user.id
+        )
     
     return {
         "message": "Calculation restarted",
@@ -672,3 +687,216 @@ def filter_calculation_by_date(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error filtering results: {str(e)}"
         )
+
+
+# Nejvýše bodů mřížky v jedné citlivostní studii
+MAX_SWEEP_POINTS = 500
+
+
+def run_sweep_task(
+    calculation_id: str,
+    input_params: dict,
+    grid: dict,
+    user_id: str
+):
+    """Background task to run parameter sweep, progress is stored after every grid point."""
+    from app.database import SessionLocal
+    db_session = SessionLocal()
+    
+    try:
+        calculation = db_session.query(Calculation).filter(Calculation.id == calculation_id).first()
+        
+        if not calculation:
+            db_session.close()
+            return
+        
+        points_count = calculation.input_metadata.get("points_count")
+        
+        # Update status to running
+        calculation.status = CalculationStatus.running.value
+        calculation.started_at = datetime.utcnow()
+        calculation.progress = 0
+        db_session.commit()
+        
+        log_entry = CalculationLog(
+            calculation_id=calculation_id,
+            log_level="INFO",
+            message=f"Sweep started ({points_count} points)",
+            timestamp=datetime.utcnow()
+        )
+        db_session.add(log_entry)
+        db_session.commit()
+        
+        def on_progress(value: int):
+            # Průběh z libs/progress je v promile, po každém bodu mřížky
+            calculation.progress = int(value // 10)
+            calculation.input_metadata = {
+                **calculation.input_metadata,
+                "points_done": int(round(value*points_count/1000))
+            }
+            db_session.commit()
+        
+        start_time = datetime.utcnow()
+        results = calculation_engine.sweep(input_params, grid, progress_callback=on_progress)
+        execution_time = (datetime.utcnow() - start_time).total_seconds()
+        
+        calculation.results = {
+            "type": "sweep",
+            "columns": results.get("columns"),
+            "points": results.get("points")
+        }
+        calculation.status = CalculationStatus.completed.value
+        calculation.completed_at = datetime.utcnow()
+        calculation.execution_time_seconds = execution_time
+        calculation.progress = 100
+        db_session.commit()
+        
+        log_entry = CalculationLog(
+            calculation_id=calculation_id,
+            log_level="INFO",
+            message=f"Sweep completed in {execution_time:.2f}s",
+            timestamp=datetime.utcnow()
+        )
+        db_session.add(log_entry)
+        db_session.commit()
+        
+    except Exception as e:
+        db_session.rollback()
+        calculation.status = CalculationStatus.failed.value
+        calculation.completed_at = datetime.utcnow()
+        calculation.error_message = str(e)
+        db_session.commit()
+        
+        log_entry = CalculationLog(
+            calculation_id=calculation_id,
+            log_level="ERROR",
+            message=f"Sweep failed: {str(e)}",
+            timestamp=datetime.utcnow()
+        )
+        db_session.add(log_entry)
+        db_session.commit()
+        
+    finally:
+        db_session.close()
+
+
+@router.post("/sweep", status_code=status.HTTP_201_CREATED)
+def create_sweep(
+    sweep_request: SweepRequest,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create and start a parameter sweep (sensitivity study) over prepared data.
+    Every combination of grid values is calculated, the data are prepared once
+    and the points run in parallel (Optimalizace.pocetprocesu, default 1,
+    0 = all cores).
+    
+    The sweep runs asynchronously in the background, poll GET /sweep/{sweep_id}
+    for progress and results (one row per point: parameters, annual cost,
+    savings and battery cycles). Logs are available at /{sweep_id}/logs.
+    
+    Example request body:
+    ```json
+    {
+        "input_params": {"Optimalizace": {"optimizationtype": 0}},
+        "grid": {
+            "Baterie.b_cap": [500, 1000, 2000],
+            "FVE.pv_powernom": [100, 200]
+        }
+    }
+    ```
+    """
+    n_points = 1
+    for values in sweep_request.grid.values():
+        n_points *= len(values)
+    
+    if not sweep_request.grid or n_points == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sweep grid is empty"
+        )
+    
+    if n_points > MAX_SWEEP_POINTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Sweep grid has {n_points} points, maximum is {MAX_SWEEP_POINTS}"
+        )
+    
+    # Neplatné parametry mřížky se odmítnou hned, ne až v úloze na pozadí
+    is_valid, error_msg = calculation_engine.validate_sweep(sweep_request.input_params, sweep_request.grid)
+    if not is_valid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=error_msg
+        )
+    
+    # Citlivostní studie se ukládá jako výpočet, mřížka je v input_metadata
+    calculation = Calculation(
+        user_id=current_user.id,
+        name=sweep_request.name,
+        description=sweep_request.description,
+        status=CalculationStatus.pending.value,
+        input_params=sweep_request.input_params,
+        input_metadata={
+            "sweep_grid": sweep_request.grid,
+            "points_count": n_points,
+            "points_done": 0
+        }
+    )
+    
+    db.add(calculation)
+    db.commit()
+    db.refresh(calculation)
+    
+    # Start sweep in background
+    background_tasks.add_task(
+        run_sweep_task,
+        calculation.id,
+        sweep_request.input_params,
+        sweep_request.grid,
+        current_user.id
+    )
+    
+    return {
+        "sweep_id": calculation.id,
+        "status": calculation.status,
+        "points_count": n_points
+    }
+
+
+@router.get("/sweep/{sweep_id}", response_model=SweepStatusResponse)
+def get_sweep(
+    sweep_id: str,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """Get parameter sweep status, progress and (once completed) the results table."""
+    calculation = db.query(Calculation).filter(
+        Calculation.id == sweep_id,
+        Calculation.user_id == current_user.id
+    ).first()
+    
+    if not calculation or "sweep_grid" not in (calculation.input_metadata or {}):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Sweep not found"
+        )
+    
+    results = calculation.results or {}
+    
+    return SweepStatusResponse(
+        sweep_id=calculation.id,
+        name=calculation.name,
+        status=calculation.status,
+        progress=calculation.progress or 0,
+        points_count=calculation.input_metadata.get("points_count"),
+        points_done=calculation.input_metadata.get("points_done"),
+        columns=results.get("columns"),
+        points=results.get("points"),
+        error_message=calculation.error_message,
+        execution_time_seconds=calculation.execution_time_seconds,
+        created_at=calculation.created_at,
+        completed_at=calculation.completed_at
+    )
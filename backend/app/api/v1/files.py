@@ -2,11 +2,11 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File as FastAPIFile, Query
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Optional
 import os
 import hashlib
 import uuid
-from datetime import datetime, date
+from datetime import datetime
 import pandas as pd
 
 from app.database import get_db
@@ -24,48 +24,113 @@ def calculate_file_hash(file_content: bytes) -> str:
     return hashlib.sha256(file_content).hexdigest()
 
 
-def parse_csv_metadata(file_path: str) -> tuple[dict, datetime.date, datetime.date]:
-    """Parse CSV file and extract metadata including date range."""
+def is_date_column(col) -> bool:
+    """Heuristic for date/time column names."""
+    col = str(col).lower()
+    return 'date' in col or 'datum' in col or 'time' in col or 'timestamp' in col
+
+
+def update_date_range(ranges: dict, col, values) -> None:
+    """Update running min/max of a date column with a new block of values."""
+    try:
+        valid_dates = pd.to_datetime(pd.Series(values), errors='coerce').dropna()
+        if len(valid_dates) > 0:
+            col_min = valid_dates.min()
+            col_max = valid_dates.max()
+            old = ranges.get(col)
+            if old is not None:
+                col_min = min(col_min, old[0])
+                col_max = max(col_max, old[1])
+            ranges[col] = (col_min, col_max)
+    except Exception as e:
+        print(f"Error parsing date column {col}: {e}")
+
+
+def finish_date_range(metadata: dict, ranges: dict, with_columns: bool) -> tuple:
+    """Overall date range from per-column ranges."""
+    date_from = None
+    date_to = None
+    for col, (col_min, col_max) in ranges.items():
+        if with_columns:
+            metadata[f"{col}_min"] = str(col_min)
+            metadata[f"{col}_max"] = str(col_max)
+        
+        if date_from is None or col_min < pd.Timestamp(date_from):
+            date_from = col_min.date()
+        if date_to is None or col_max > pd.Timestamp(date_to):
+            date_to = col_max.date()
+    
+    return date_from, date_to
+
+
+def parse_csv_metadata(file_path: str, chunk_rows: int = 100_000) -> tuple[dict, datetime.date, datetime.date]:
+    """Parse CSV file in chunks and extract metadata including date range."""
     try:
-        df = pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip')
+        metadata = {}
+        ranges = {}
+        row_count = 0
         
-        metadata = {
-            "columns": list(df.columns),
-            "row_count": len(df),
-            "shape": df.shape,
-        }
+        for chunk in pd.read_csv(file_path, encoding='utf-8', on_bad_lines='skip', chunksize=chunk_rows):
+            if not metadata:
+                metadata["columns"] = list(chunk.columns)
+            row_count += len(chunk)
+            
+            for col in chunk.columns:
+                if is_date_column(col):
+                    update_date_range(ranges, col, chunk[col])
         
-        date_from = None
-        date_to = None
+        metadata["row_count"] = row_count
+        metadata["shape"] = (row_count, len(metadata.get("columns", [])))
         
-        # Try to detect and parse date columns
-        date_columns = []
-        for col in df.columns:
-            if 'date' in col.lower() or 'datum' in col.lower() or 'time' in col.lower() or 'timestamp' in col.lower():
-                date_columns.append(col)
-                try:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-                    # Remove NaT values
-                    valid_dates = df[col].dropna()
-                    if len(valid_dates) > 0:
-                        col_min = valid_dates.min()
-                        col_max = valid_dates.max()
-                        metadata[f"{col}_min"] = str(col_min)
-                        metadata[f"{col}_max"] = str(col_max)
-                        
-                        # Set overall date range
-                        if date_from is None or col_min < pd.Timestamp(date_from):
-                            date_from = col_min.date()
-                        if date_to is None or col_max > pd.Timestamp(date_to):
-                            date_to = col_max.date()
-                except Exception as e:
-                    print(f"Error parsing date column {col}: {e}")
+        date_from, date_to = finish_date_range(metadata, ranges, True)
         
         return metadata, date_from, date_to
     except Exception as e:
         return {"error": str(e)}, None, None
 
 
+def parse_excel_metadata(file_path: str, chunk_rows: int = 100_000) -> tuple[dict, datetime.date, datetime.date]:
+    """Stream the first sheet of an xlsx file (read-only) and extract metadata."""
+    import openpyxl
+    
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = list(next(rows, None) or ())
+        while header and header[-1] is None:
+            header.pop()
+        columns = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        date_idx = [i for i, col in enumerate(columns) if is_date_column(col)]
+        
+        metadata = {"columns": columns}
+        ranges = {}
+        row_count = 0
+        block = {i: [] for i in date_idx}
+        
+        for row in rows:
+            # Prázdné řádky na konci listu pandas také nepočítá
+            if all(c is None for c in row):
+                continue
+            row_count += 1
+            for i in date_idx:
+                block[i].append(row[i] if i < len(row) else None)
+            
+            if row_count % chunk_rows == 0:
+                for i in date_idx:
+                    update_date_range(ranges, columns[i], block[i])
+                    block[i] = []
+        
+        for i in date_idx:
+            update_date_range(ranges, columns[i], block[i])
+        
+        metadata["row_count"] = row_count
+        date_from, date_to = finish_date_range(metadata, ranges, False)
+        
+        return metadata, date_from, date_to
+    finally:
+        wb.close()
+
+
 @router.post("/upload", response_model=FileUploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_file(
     file: UploadFile = FastAPIFile(...),
@@ -144,27 +209,19 @@ async def upload_file(
             file_metadata, date_from, date_to = parse_csv_metadata(file_path)
             rows_count = file_metadata.get("row_count")
         else:
-            # For Excel files, try to read and get row count
+            # For Excel files, stream rows to get row count and date range
             try:
-                df = pd.read_excel(file_path)
-                rows_count = len(df)
-                file_metadata = {"row_count": rows_count, "columns": list(df.columns)}
-                
-                # Try to detect date columns in Excel too
-                for col in df.columns:
-                    if 'date' in col.lower() or 'datum' in col.lower() or 'time' in col.lower():
-                        try:
-                            df[col] = pd.to_datetime(df[col], errors='coerce')
-                            valid_dates = df[col].dropna()
-                            if len(valid_dates) > 0:
-                                col_min = valid_dates.min()
-                                col_max = valid_dates.max()
-                                if date_from is None or col_min < pd.Timestamp(date_from):
-                                    date_from = col_min.date()
-                                if date_to is None or col_max > pd.Timestamp(date_to):
-                                    date_to = col_max.date()
-                        except:
-                            pass
+                if file_ext == ".xlsx":
+                    file_metadata, date_from, date_to = parse_excel_metadata(file_path)
+                else:
+                    df = pd.read_excel(file_path)
+                    file_metadata = {"row_count": len(df), "columns": list(df.columns)}
+                    ranges = {}
+                    for col in df.columns:
+                        if is_date_column(col):
+                            update_date_range(ranges, col, df[col])
+                    date_from, date_to = finish_date_range(file_metadata, ranges, False)
+                rows_count = file_metadata.get("row_count")
             except Exception as e:
                 print(f"Error parsing Excel file: {e}")
     
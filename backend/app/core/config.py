@@ -43,6 +43,9 @@ class Settings(BaseSettings):
     # Libs path (Python výpočetní engine) - relative to project root
     LIBS_PATH: str = "../libs"
     
+    # Paměťová cache připravených dat a profilů FVE v rámci workeru
+    DATA_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # 512MB
+    
     # Email (Optional)
     SMTP_HOST: Optional[str] = None
     SMTP_PORT: Optional[int] = None
@@ -1,7 +1,7 @@
 """Calculation schemas."""
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Union
 from datetime import datetime
 from enum import Enum
 
@@ -168,3 +168,47 @@ class DateFilterRequest(BaseModel):
                 "date_to": "2024-03-31"
             }
         }
+
+
+class SweepRequest(BaseModel):
+    """Request to run a parameter sweep (sensitivity study)."""
+    name: str = Field("Citlivostní studie", min_length=1, max_length=255)
+    description: Optional[str] = None
+    input_params: dict = Field(..., description="Base calculation parameters shared by all grid points")
+    # Hodnoty si zachovávají typ z JSON (bool, int, float, str), kontrolují se proti konfiguraci
+    grid: Dict[str, List[Union[bool, int, float, str]]] = Field(..., description="Parameter values as {'Section.key': [values]}, all combinations are calculated")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "name": "Citlivostní studie baterie",
+                "input_params": {
+                    "Optimalizace": {
+                        "optimizationtype": 0,
+                        "pocetprocesu": 0
+                    }
+                },
+                "grid": {
+                    "Baterie.b_cap": [500, 1000, 2000],
+                    "FVE.pv_powernom": [100, 200],
+                    "Pmax.pmaxodber": [400, 600],
+                    "Optimalizace.povolitprekrocenipmax": [True, False]
+                }
+            }
+        }
+
+
+class SweepStatusResponse(BaseModel):
+    """Parameter sweep status and results (results once completed)."""
+    sweep_id: str
+    name: str
+    status: str
+    progress: int = Field(0, description="Progress over all grid points (0-100)")
+    points_count: Optional[int] = None
+    points_done: Optional[int] = None
+    columns: Optional[List[str]] = None
+    points: Optional[List[dict]] = None
+    error_message: Optional[str] = None
+    execution_time_seconds: Optional[float] = None
+    created_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
@@ -5,12 +5,54 @@ from pathlib import Path
 from typing import Dict, Any, Callable, Optional
 from datetime import datetime
 from app.core.config import settings
+from app.services.data_cache import PreparedDataCache
 
 # Set matplotlib to use non-GUI backend before any imports
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
 
 
+# Mock PySide6 widgety pro kompatibilitu s existujícím kódem
+class MockProgressBar:
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._value = 0
+        
+    def setValue(self, value):
+        self._value = value
+        if self.callback:
+            self.callback(int(value))
+            
+    def value(self):
+        return self._value
+
+
+class MockLabel:
+    def __init__(self, callback=None):
+        self._text = ""
+        self._style = ""
+        self.callback = callback
+        
+    def setText(self, text):
+        self._text = text
+        if self.callback:
+            self.callback(f"[LABEL] {text}")
+        
+    def setStyleSheet(self, style):
+        self._style = style
+
+
+class MockConsole:
+    def __init__(self, callback=None):
+        self.logs = []
+        self.callback = callback
+        
+    def insertPlainText(self, text):
+        self.logs.append(text)
+        if self.callback:
+            self.callback(text)
+
+
 class CalculationEngine:
     """
     Bridge k existujícímu Python výpočetnímu enginu.
@@ -31,6 +73,9 @@ class CalculationEngine:
         self.last_modified = {}
         self.version = "1.0.0"
         
+        # Připravená data a profily FVE sdílené mezi výpočty
+        self.data_cache = PreparedDataCache(settings.DATA_CACHE_MAX_BYTES)
+        
         # Přidat libs parent do sys.path
         libs_parent = str(self.libs_path.parent)
         if libs_parent not in sys.path:
@@ -54,6 +99,9 @@ class CalculationEngine:
                self.last_modified[module_name] < mtime:
                 self._reload_module(module_name)
                 self.last_modified[module_name] = mtime
+                
+                # Změněný kód může připravovat data jinak
+                self.data_cache.clear()
     
     def _reload_module(self, module_name: str):
         """Hot reload Python modulu"""
@@ -153,26 +201,12 @@ class CalculationEngine:
         
         return result
     
-    def calculate(
+    def _prepare_config(
         self, 
         config: Dict[str, Any], 
-        progress_callback: Optional[Callable[[int], None]] = None,
         log_callback: Optional[Callable[[str], None]] = None
     ) -> Dict[str, Any]:
-        """
-        Hlavní výpočetní funkce - bridge k libs/process.py
-        
-        Args:
-            config: Dictionary s konfigurací (stejný formát jako INI)
-            progress_callback: Funkce pro aktualizaci progressu (0-100)
-            log_callback: Funkce pro logování zpráv
-            
-        Returns:
-            Dictionary s výsledky kalkulace
-        """
-        # Kontrola updates před výpočtem
-        self._check_updates()
-        
+        """Sloučí konfiguraci s default.ini, doplní chybějící parametry a převede cesty na absolutní"""
         # Načíst default config jako základ
         default_config = self._load_default_config()
         
@@ -185,55 +219,7 @@ class CalculationEngine:
             if log_callback:
                 log_callback("Warning: Could not load default.ini, using user config only")
         
-        # Import process modulu
-        process = self.get_module("process")
-        if not process:
-            raise ImportError("Failed to load process module from libs/")
-        
-        # Mock PySide6 widgety pro kompatibilitu s existujícím kódem
-        class MockProgressBar:
-            def __init__(self, callback=None):
-                self.callback = callback
-                self._value = 0
-                
-            def setValue(self, value):
-                self._value = value
-                if self.callback:
-                    self.callback(int(value))
-                    
-            def value(self):
-                return self._value
-        
-        class MockLabel:
-            def __init__(self):
-                self._text = ""
-                self._style = ""
-                
-            def setText(self, text):
-                self._text = text
-                if log_callback:
-                    log_callback(f"[LABEL] {text}")
-                
-            def setStyleSheet(self, style):
-                self._style = style
-        
-        class MockConsole:
-            def __init__(self, callback=None):
-                self.logs = []
-                self.callback = callback
-                
-            def insertPlainText(self, text):
-                self.logs.append(text)
-                if self.callback:
-                    self.callback(text)
-        
-        # Vytvořit mock objekty
-        progress_bar = MockProgressBar(progress_callback)
-        label = MockLabel()
-        console = MockConsole(log_callback)
-        
-        # Upravit cesty v konfiguraci na absolutní
-        # Získat kořenový adresář projektu (parent libs/)
+        # Kořenový adresář projektu (parent libs/)
         root_dir = self.libs_path.parent
         
         # Zajistit existenci sekce Obecne s defaultními hodnotami
@@ -257,8 +243,20 @@ class CalculationEngine:
                 'pouzitfixnicenu': False,
                 'pouzitpredikcispotreby': False,
                 'simulaceskutecnehoprovozu': False,
-                'optimization_horizon': 24,
-                'time_resolution': 1
+                'optimalizovatceleobdobi': False,
+                'nezavisledny': False,
+                'stavnabitinahranici': 0.5,
+                'pocetprocesu': 1,
+                'resic': 'lp',
+                'milpcasovylimit': 10.0,
+                'milpmezera': 0.0001,
+                'cachedat': True,
+                'kompaktnipamet': False,
+                'optimization_horizon': 36,
+                'replanovani': 24,
+                'hodinaplanovani': 12,
+                'time_resolution': 1,
+                'mpc': False
             }
             for key, default_value in optimalizace_defaults.items():
                 if key not in config['Optimalizace']:
@@ -325,12 +323,54 @@ class CalculationEngine:
             if log_callback:
                 log_callback(f"Set slozka_diagramy to: {config['Obecne']['slozka_diagramy']}")
         
+        return config
+    
+    def calculate(
+        self, 
+        config: Dict[str, Any], 
+        progress_callback: Optional[Callable[[int], None]] = None,
+        log_callback: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Hlavní výpočetní funkce - bridge k libs/process.py
+        
+        Args:
+            config: Dictionary s konfigurací (stejný formát jako INI)
+            progress_callback: Funkce pro aktualizaci progressu (0-100)
+            log_callback: Funkce pro logování zpráv
+            
+        Returns:
+            Dictionary s výsledky kalkulace
+        """
+        # Kontrola updates před výpočtem
+        self._check_updates()
+        
+        config = self._prepare_config(config, log_callback)
+        
+        # Import process modulu
+        process = self.get_module("process")
+        if not process:
+            raise ImportError("Failed to load process module from libs/")
+        
+        # Vytvořit mock objekty
+        progress_bar = MockProgressBar(progress_callback)
+        label = MockLabel(log_callback)
+        console = MockConsole(log_callback)
+        
+        # Získat kořenový adresář projektu (parent libs/)
+        root_dir = self.libs_path.parent
+        
         # Spustit výpočet
         try:
             if log_callback:
                 log_callback(f"Starting calculation with config: {list(config.keys())}")
             
-            raw_results = process.calculate(config, progress_bar, label, console)
+            raw_results = process.calculate(config, progress_bar, label, console, dataCache=self.data_cache)
+            
+            if log_callback:
+                log_callback(f"Data cache: {self.data_cache.stats()}")
+                log_callback(f"Optimization runtime: {raw_results.get('runtime', 0):.2f} s "
+                             f"({raw_results.get('solves', 0)} solves, {raw_results.get('runtimeYear', 0):.2f} s per year of data)")
             
             # Save dataRed to pickle for date filtering
             ready_path = config['Obecne']['slozka_zpracovane']
@@ -418,7 +458,7 @@ class CalculationEngine:
                         "battCycles": to_python_type(raw_results.get('battCycles')),
                         "battCyclesYear": to_python_type(raw_results.get('battCyclesYear')),
                         "timeString": raw_results.get('timeString'),
-                        "dataCount": len(raw_results.get('data', [])) if raw_results.get('data') is not None else 0,
+                        "dataCount": raw_results.get('dataCount', len(raw_results['data']) if raw_results.get('data') is not None else 0),
                         "dataRedCount": len(raw_results.get('dataRed', [])) if raw_results.get('dataRed') is not None else 0,
                     },
                     "input_metadata": input_metadata,
@@ -466,6 +506,7 @@ class CalculationEngine:
                         # Import required modules
                         funsCost = self._get_module('funsCost')
                         dataRed = raw_results.get('dataRed')
+                        dt = raw_results.get('dt', 1)
                         
                         if dataRed is not None:
                             # Convert date strings to datetime objects
@@ -493,22 +534,22 @@ class CalculationEngine:
                             )
                             
                             # Recalculate cost for filtered period
-                            dfCost, _, _ = funsCost.calculateCost(dataRed, fees, dt=1, ind=ind)
+                            dfCost, _, _ = funsCost.calculateCost(dataRed, fees, dt=dt, ind=ind)
                             dfCostForm = funsCost.printCost(dfCost, False)
                             
                             # Recalculate energy balance for filtered period
-                            dfEnergy = funsCost.energyBalance(dataRed, dt=1, ind=ind)
+                            dfEnergy = funsCost.energyBalance(dataRed, dt=dt, ind=ind)
                             dfEnergyForm = funsCost.printCost(dfEnergy, False)
                             
                             # Recalculate financial balance for filtered period
-                            dfFinance = funsCost.financialBalance(dataRed, fees, dt=1, ind=ind)
+                            dfFinance = funsCost.financialBalance(dataRed, fees, dt=dt, ind=ind)
                             dfFinanceForm = funsCost.printCost(dfFinance, False)
                             
                             # Calculate battery cycles for filtered period
                             battCycles = funsCost.batteryCycles(dataRed, ind=ind)
                             
                             # Calculate filtered period info
-                            hours_in_period = ind.sum()
+                            hours_in_period = ind.sum()*dt
                             days_in_period = hours_in_period / 24
                             
                             # Update results with filtered data
@@ -563,6 +604,115 @@ class CalculationEngine:
             print(f"❌ {error_msg}")
             raise
     
+    def sweep(
+        self,
+        config: Dict[str, Any],
+        grid: Dict[str, list],
+        progress_callback: Optional[Callable[[int], None]] = None,
+        log_callback: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Citlivostní studie - bridge k libs/sweep.py
+        
+        Args:
+            config: Dictionary s konfigurací (stejný formát jako INI), základ všech bodů
+            grid: Hodnoty parametrů {'Sekce.klic': [hodnoty]}, počítají se všechny kombinace
+            progress_callback: Funkce pro aktualizaci progressu přes celou mřížku
+            log_callback: Funkce pro logování zpráv
+        
+        Returns:
+            Dictionary se sloupci a řádky tabulky výsledků (jeden řádek na bod mřížky)
+        """
+        # Kontrola updates před výpočtem
+        self._check_updates()
+        
+        config = self._prepare_config(config, log_callback)
+        
+        sweep = self.get_module("sweep")
+        if not sweep:
+            raise ImportError("Failed to load sweep module from libs/")
+        
+        is_valid, error_msg = self._validate_sweep_points(sweep, config, grid)
+        if not is_valid:
+            raise ValueError(error_msg)
+        
+        progress_bar = MockProgressBar(progress_callback)
+        label = MockLabel(log_callback)
+        console = MockConsole(log_callback)
+        
+        try:
+            # Připravená data se berou ze stejné cache jako u jednotlivých výpočtů
+            table = sweep.sweep(config, grid, progress_bar, label, console, dataCache=self.data_cache)
+            
+            if log_callback:
+                log_callback(f"Data cache: {self.data_cache.stats()}")
+            
+            # NaN (např. bez úspěšných výpočtů) není platný JSON
+            points = [
+                {key: (None if isinstance(value, float) and value != value else value) for key, value in row.items()}
+                for row in table.to_dict(orient='records')
+            ]
+            
+            return {
+                "columns": list(table.columns),
+                "points": points,
+                "logs": console.logs,
+                "engine_version": self.version
+            }
+        
+        except Exception as e:
+            error_msg = f"Sweep error: {str(e)}"
+            if log_callback:
+                log_callback(error_msg)
+            
+            print(f"❌ {error_msg}")
+            raise
+    
+    def validate_sweep(self, config: Dict[str, Any], grid: Dict[str, list]) -> tuple[bool, Optional[str]]:
+        """
+        Validace citlivostní studie před spuštěním (parametry mřížky i všechny body).
+        
+        Args:
+            config: Dictionary s konfigurací, základ všech bodů
+            grid: Hodnoty parametrů {'Sekce.klic': [hodnoty]}
+            
+        Returns:
+            Tuple (is_valid, error_message)
+        """
+        self._check_updates()
+        
+        sweep = self.get_module("sweep")
+        if not sweep:
+            return False, "Failed to load sweep module from libs/"
+        
+        return self._validate_sweep_points(sweep, self._prepare_config(config), grid)
+    
+    def _validate_sweep_points(self, sweep, config: Dict[str, Any], grid: Dict[str, list]) -> tuple[bool, Optional[str]]:
+        """Parametry mřížky musí existovat v konfiguraci a mít typ její hodnoty, body musí projít validate_config"""
+        try:
+            points = sweep.sweepPoints(config, grid)
+        except ValueError as e:
+            return False, str(e)
+        
+        # Typ hodnot podle konfigurace doplněné z default.ini (bool, číslo, text), None připouští cokoliv
+        for key, values in grid.items():
+            section, _, name = key.partition('.')
+            default = config[section][name]
+            if default is None:
+                continue
+            
+            for value in values:
+                if isinstance(value, bool) != isinstance(default, bool) or \
+                   isinstance(value, (int, float)) != isinstance(default, (int, float)):
+                    return False, f"Invalid value {value!r} for {key}: expected {type(default).__name__}"
+        
+        for point in points:
+            is_valid, error_msg = self.validate_config(sweep.pointConf(config, point))
+            if not is_valid:
+                return False, f"Invalid configuration for point {point}: {error_msg}"
+        
+        return True, None
+    
     def validate_config(self, config: Dict[str, Any]) -> tuple[bool, Optional[str]]:
         """
         Validace konfigurace před výpočtem.
@@ -587,6 +737,10 @@ class CalculationEngine:
             if config["FVE"]["pv_powernom"] <= 0:
                 return False, "PV power must be > 0"
             
+            resic = config["Optimalizace"].get("resic", "lp")
+            if resic not in ("lp", "bisekce"):
+                return False, f"Unknown solver (Optimalizace.resic): {resic}"
+            
             # Další validace...
             
         except KeyError as e:
@@ -636,6 +790,9 @@ class CalculationEngine:
             
             dataRed = pd.read_pickle(data_red_path)
             
+            # Čtvrthodinová data mají sloupec Ctvrthodina
+            dt = 0.25 if 'Ctvrthodina' in dataRed.columns else 1
+            
             # Convert date strings to datetime objects
             d0 = datetime.strptime(date_from, '%Y-%m-%d').date()
             d1 = datetime.strptime(date_to, '%Y-%m-%d').date()
@@ -661,15 +818,15 @@ class CalculationEngine:
             )
             
             # Recalculate cost for filtered period
-            dfCost, _, _ = funsCost.calculateCost(dataRed, fees, dt=1, ind=ind)
+            dfCost, _, _ = funsCost.calculateCost(dataRed, fees, dt=dt, ind=ind)
             dfCostForm = funsCost.printCost(dfCost, False)
             
             # Recalculate energy balance for filtered period
-            dfEnergy = funsCost.energyBalance(dataRed, dt=1, ind=ind)
+            dfEnergy = funsCost.energyBalance(dataRed, dt=dt, ind=ind)
             dfEnergyForm = funsCost.printCost(dfEnergy, False)
             
             # Recalculate financial balance for filtered period
-            dfFinance = funsCost.financialBalance(dataRed, fees, dt=1, ind=ind)
+            dfFinance = funsCost.financialBalance(dataRed, fees, dt=dt, ind=ind)
             dfFinanceForm = funsCost.printCost(dfFinance, False)
             
             # Calculate battery cycles for filtered period
@@ -705,7 +862,7 @@ class CalculationEngine:
                 return val
             
             # Calculate filtered period info
-            hours_in_period = ind.sum()
+            hours_in_period = ind.sum()*dt
             days_in_period = hours_in_period / 24
             
             return {
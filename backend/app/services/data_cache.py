@@ -0,0 +1,80 @@
+"""In-memory LRU cache of prepared datasets and PV profiles."""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+def estimate_size(value: Any) -> int:
+    """Odhad velikosti položky v bajtech (DataFrame, ndarray, ostatní)."""
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class PreparedDataCache:
+    """
+    Omezená LRU cache připravených dat v rámci jednoho workeru.
+    Vyřazuje nejdéle nepoužité položky, dokud celková velikost nepřekročí limit.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.items: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Vrátí položku a označí ji jako naposledy použitou, jinak None"""
+        with self._lock:
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+
+            self.items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key: Hashable, value: Any):
+        """Uloží položku, položka větší než celý limit se neukládá"""
+        nbytes = estimate_size(value)
+
+        with self._lock:
+            if key in self.items:
+                self.size -= self.items.pop(key)[1]
+
+            if nbytes > self.max_bytes:
+                return
+
+            self.items[key] = (value, nbytes)
+            self.size += nbytes
+
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.items.popitem(last=False)
+                self.size -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        """Vyprázdní cache, čítače zůstávají"""
+        with self._lock:
+            self.items.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Čítače zásahů a aktuální obsazení"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.items),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes
+            }
@@ -115,7 +115,7 @@ print(f"   Total hours: {total_hours}")
 print("\n=== PROCESSING CONSUMPTION FILES ===")
 import sys
 sys.path.insert(0, str(root_dir / "libs"))
-from libs.load import readExcel
+from libs.load import readExcel, sumFrames
 
 # Read all consumption files and create consumption.pkl
 consumption_frames = []
@@ -130,23 +130,9 @@ if len(consumption_frames) == 1:
     consumption_df = consumption_frames[0]
 else:
     # Merge multiple files (intersection logic from loadData)
-    import numpy as np
-    ids = [None for i in range(len(consumption_frames))]
-    for i in range(len(ids)):
-        ids[i] = [(d + pd.Timedelta(h-1, 'h')).strftime('%Y%m%d%H') for d, h in zip(consumption_frames[i]['Den'], consumption_frames[i]['Hodina'])]
-    
-    monolith = np.concatenate(ids)
-    unq, counts = np.unique(monolith, return_counts=True)
-    subset = unq[counts == len(ids)]
-    
-    inds = [np.intersect1d(idi, subset, return_indices=True)[1] for idi in ids]
-    
-    for i, frame in enumerate(consumption_frames):
-        consumption_frames[i] = frame.iloc[inds[i]].reset_index(drop=True)
-    
-    consumption_df = consumption_frames[0].copy()
-    for i in range(1, len(consumption_frames)):
-        consumption_df['kWh'] += consumption_frames[i]['kWh']
+    consumption_df, dropped = sumFrames(consumption_frames)
+    if len(dropped):
+        print(f"⚠️ Dropped {len(dropped)} hours missing in some files")
 
 # Save consumption.pkl
 consumption_df.to_pickle(data_ready_dir / 'consumption.pkl')
@@ -0,0 +1,103 @@
+"""
+Benchmark celého výpočtu (process.calculate) na víceletých vstupních datech
+
+Z připravených zdrojů (prices.pkl, weather.pkl, consumption.pkl v data_ready/) se poskládá
+víceletý vstup: první rok se opakuje s posunem o 52 týdnů, takže dny v týdnu zůstávají.
+Data se uloží do dočasné složky a výpočet se spustí několikrát, vypíše se každý běh a nejlepší.
+
+Srovnání před a po změně: stejný skript se spustí nad jinou verzí kódu, např.
+    git worktree add /tmp/old <commit>
+    python benchmark_calculate.py --repo /tmp/old
+
+Použití: python benchmark_calculate.py [--years 5] [--repeat 3] [--type 0] [--solver lp] [--repo .]
+"""
+import sys
+import io
+import argparse
+import contextlib
+import shutil
+import tempfile
+from pathlib import Path
+from timeit import default_timer as timer
+
+import numpy as np
+import pandas as pd
+
+project_root = Path(__file__).parent
+
+
+class MockProgressBar:
+    def setValue(self, val):
+        pass
+
+class MockLabel:
+    def setText(self, text):
+        pass
+
+class MockConsole:
+    def insertPlainText(self, text):
+        pass
+
+
+def multiYearData(dataPath, outPath, years):
+    # Každý zdroj se ořízne na 52 týdnů od prvního dne a opakuje se s posunem o 52 týdnů
+    for name in ('prices.pkl', 'weather.pkl', 'consumption.pkl'):
+        source = pd.read_pickle(dataPath / name)
+        first = source['Den'].min()
+        source = source[source['Den'] < first + pd.Timedelta(days=364)]
+
+        copies = []
+        for year in range(years):
+            copy = source.copy()
+            copy['Den'] = copy['Den'] + pd.Timedelta(days=364*year)
+            copies.append(copy)
+
+        pd.concat(copies, ignore_index=True).to_pickle(outPath / name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=5, help='počet let vstupních dat')
+    parser.add_argument('--repeat', type=int, default=3, help='počet běhů')
+    parser.add_argument('--type', type=int, default=0, help='typ optimalizace')
+    parser.add_argument('--solver', default='lp', help='řešič (lp, bisekce jen pro typ 1)')
+    parser.add_argument('--repo', default=str(project_root), help='kořen repozitáře s libs/ k měření')
+    args = parser.parse_args()
+
+    sys.path.insert(0, args.repo)
+    from libs.config import readConfig
+    from libs.process import calculate
+
+    tmp = Path(tempfile.mkdtemp(prefix='benchmark_'))
+    try:
+        multiYearData(project_root / 'data_ready', tmp, args.years)
+
+        conf = readConfig(str(project_root / 'user_settings' / 'default.ini'))
+        conf['Obecne']['slozka_zpracovane'] = str(tmp) + '/'
+        conf['Optimalizace']['optimizationtype'] = args.type
+        conf['Optimalizace']['resic'] = args.solver
+        conf['Optimalizace']['pocetprocesu'] = 1
+        conf['Export']['export'] = False
+
+        print('Kód: ' + args.repo)
+        print('Data: ' + str(args.years) + ' let, typ ' + str(args.type) + ', řešič ' + args.solver)
+
+        times = []
+        for run in range(args.repeat):
+            np.random.seed(0)
+            t0 = timer()
+            with contextlib.redirect_stdout(io.StringIO()):
+                res = calculate(conf, MockProgressBar(), MockLabel(), MockConsole())
+            times.append(timer() - t0)
+
+            dataRed = res['dataRed'] if isinstance(res, dict) else None
+            rows = len(dataRed) if dataRed is not None else '?'
+            print('běh ' + str(run+1) + ': ' + '{:.2f}'.format(times[-1]) + ' s (' + str(rows) + ' řádků)')
+
+        print('nejlepší: ' + '{:.2f}'.format(min(times)) + ' s')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark prediktivního řízení (MPC) proti provedení denního plánu (open loop)
+
+Oba režimy počítají s predikcí spotřeby z minulého týdne a provádí plán se skutečnou
+spotřebou a výrobou (batteryRealityLosses), vyhodnocují se stejné řádky (denní okna).
+Vypisuje počet řádků, počet řešení, dobu optimalizace (i přepočtenou na rok dat)
+a náklady varianty se spotřebou, FVE a baterií a průměrnou denní špičku odběru ze sítě
+(u typu 2 absolutní hodnoty toku ze sítě, jako v optimalizaci).
+
+Použití: python benchmark_mpc.py [typy optimalizace, výchozí 0 1 2]
+"""
+import sys
+import io
+import contextlib
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from libs.config import readConfig
+from libs.process import calculate
+
+
+class MockProgressBar:
+    def setValue(self, val):
+        pass
+
+class MockLabel:
+    def setText(self, text):
+        pass
+
+class MockConsole:
+    def insertPlainText(self, text):
+        pass
+
+
+# (název, mpc, replanovani [h])
+MODES = [('open loop', False, 24), ('MPC 6 h', True, 6), ('MPC 1 h', True, 1)]
+
+
+def run(optimizationType, mpc, replanovani, prekroceniPmax):
+    conf = readConfig(str(project_root / 'user_settings' / 'default.ini'))
+    conf['Optimalizace']['optimizationtype'] = optimizationType
+    conf['Optimalizace']['pouzitpredikcispotreby'] = True
+    conf['Optimalizace']['simulaceskutecnehoprovozu'] = True
+    conf['Optimalizace']['povolitprekrocenipmax'] = prekroceniPmax
+    conf['Optimalizace']['mpc'] = mpc
+    conf['Optimalizace']['replanovani'] = replanovani
+    conf['Optimalizace']['pocetprocesu'] = 1
+    conf['Export']['export'] = False
+
+    np.random.seed(0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return calculate(conf, MockProgressBar(), MockLabel(), MockConsole())
+
+
+def main(types):
+    print('{:>3} {:>10} {:<10} {:>6} {:>6} {:>9} {:>9} {:>14} {:>12}'.format(
+          'typ', 'limit Pmax', 'režim', 'řádky', 'úlohy', 'doba [s]', 'rok [s]', 'náklady [Kč]', 'špička [kW]'))
+
+    for optimizationType in types:
+        for prekroceniPmax in (True, False):
+            rows = None
+            for name, mpc, replanovani in MODES:
+                res = run(optimizationType, mpc, replanovani, prekroceniPmax)
+
+                # Oba režimy musí vyhodnocovat stejné řádky
+                t0 = res['dataRed']['t0'].to_numpy()
+                if rows is None:
+                    rows = t0
+                assert np.array_equal(t0, rows), 'Režimy vyhodnocují různé řádky'
+
+                dataRed = res['dataRed']
+                cost = res['dfCostYear']['Náklady (Kč)'].iloc[3]
+                grid = (dataRed['kWh'] + dataRed['PVkWh'] + dataRed['BkWh'])/res['dt']
+                if optimizationType == 2:
+                    grid = grid.abs()
+                peak = grid.groupby(dataRed['Den']).max().mean()
+                print('{:>3} {:>10} {:<10} {:>6} {:>6} {:>9.2f} {:>9.2f} {:>14,.0f} {:>12.1f}'.format(
+                      optimizationType, 'ne' if prekroceniPmax else 'ano', name, len(t0), res['solves'],
+                      res['runtime'], res['runtimeYear'], cost, peak).replace(',', ' '))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [0, 1, 2])
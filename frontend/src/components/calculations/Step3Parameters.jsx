@@ -59,7 +59,7 @@ const Step3Parameters = ({ parameters, onChange }) => {
                 <option value="0">Minimalizovat náklady (LinProg)</option>
                 <option value="1">Minimalizovat špičky spotřeby</option>
                 <option value="2">Minimalizovat špičky spotřeby i dodávky</option>
-                <option value="3">Minimalizovat náklady (APOPT)</option>
+                <option value="3">Minimalizovat náklady (MILP)</option>
               </select>
             </div>
 
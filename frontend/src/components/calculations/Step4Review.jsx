@@ -164,7 +164,11 @@ const Step4Review = ({ selectedFile, selectedConfig, parameters }) => {
             )}
             <div>
               <span className="text-sm text-gray-600">Optimalizační horizont (h):</span>
-              <p className="text-base font-semibold text-gray-900">{getVal('Optimalizace', 'optimization_horizon', 24)}</p>
+              <p className="text-base font-semibold text-gray-900">{getVal('Optimalizace', 'optimization_horizon', 36)}</p>
+            </div>
+            <div>
+              <span className="text-sm text-gray-600">Přepočet plánu (h):</span>
+              <p className="text-base font-semibold text-gray-900">{getVal('Optimalizace', 'replanovani', 24)}</p>
             </div>
             <div>
               <span className="text-sm text-gray-600">Časové rozlišení (h):</span>
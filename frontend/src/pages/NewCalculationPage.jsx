@@ -50,7 +50,9 @@ const NewCalculationPage = () => {
       Optimalizace: {
         vnutitrokspotreby: null,
         optimizationtype: 0,
-        optimization_horizon: 24,
+        optimization_horizon: 36,
+        replanovani: 24,
+        hodinaplanovani: 12,
         time_resolution: 1,
         povolitdodavkydositezbaterie: true,
         povolitodberzesitedobaterie: true,
@@ -3,13 +3,63 @@ import pandas as pd
 
 
 
-def batteryCycles(data, B_cap, E0=0, dt=1, ind=None):
+#%% Společný výpočet bilancí
+# Kombinace toků v pořadí řádků tabulek bilance energie a financí
+COMBINATIONS = ['Pouze spotřeba', 'Pouze FVE', 'Pouze baterie', 'Spotřeba a FVE', 'Spotřeba a baterie', 'Spotřeba, FVE, bat']
+
+
+def selectArrays(data, ind=None):
+    if ind is not None:
+        data = data[ind]
+    # Kompaktní tabulka (float32) se sčítá ve float64
+    return tuple(data[c].to_numpy(dtype=float) for c in ['Kč/kWh', 'kWh', 'PVkWh', 'BkWh'])
+
+
+def balanceKernel(price, cons, supp, batt, fees, B_cap=None):
+    # Všechny součty pro náklady, bilanci energie a financí a počet cyklů v jednom průchodu.
+    # Vstupy mohou být i 2-D (scénáře x hodiny), např. víc průběhů baterie proti stejným cenám,
+    # výsledky mají tvar (scénáře x kombinace COMBINATIONS).
+    feeCons, feeSupp = fees
+    price, cons, supp, batt = np.broadcast_arrays(price, cons, supp, batt)
+    
+    cs = cons+supp
+    ener = np.stack((cons, supp, batt, cs, cons+batt, cs+batt), axis=-2)
+    price = price[..., np.newaxis, :]
+    
+    ip = ener > 0.0
+    im = ener < 0.0
+    cost = np.where(ener >= 0.0, price+feeCons, price+feeSupp)*ener
+    
+    balance = {'energyIn':    np.sum(ener, axis=-1, where=ip),
+               'energyOut':   np.sum(ener, axis=-1, where=im),
+               'energyTotal': np.sum(ener, axis=-1),
+               'costIn':      np.sum(cost, axis=-1, where=ip),
+               'costOut':     np.sum(cost, axis=-1, where=im),
+               'costTotal':   np.sum(cost, axis=-1),
+               'hours':       ener.shape[-1]}
+    
+    # Bez baterie (B_cap = 0) vychází počet cyklů NaN jako dřív v batteryCycles
+    if B_cap is not None:
+        balance['cycles'] = np.sum(np.abs(batt), axis=-1)/B_cap/2
+    
+    return balance
+
+
+
+
+#%% Náklady
+def batteryCycles(data, B_cap, E0=0, dt=1, ind=None, balance=None):
+    if balance is not None and 'cycles' in balance:
+        Ncycles = balance['cycles']
+        NcyclesYear = Ncycles * 365/(balance['hours']*dt/24)
+        return Ncycles, NcyclesYear
+    
     if ind is not None:
         # dBatt = np.diff(data['BkWh_charge'][ind], prepend=E0)
-        dBatt = data['BkWh'][ind].values
+        dBatt = data['BkWh'][ind].to_numpy(dtype=float)
     else:
         # dBatt = np.diff(data['BkWh_charge'], prepend=E0)
-        dBatt = data['BkWh'].values
+        dBatt = data['BkWh'].to_numpy(dtype=float)
 
     Ncycles = np.sum(np.abs(dBatt))/B_cap/2
     
@@ -19,35 +69,18 @@ def batteryCycles(data, B_cap, E0=0, dt=1, ind=None):
     
 
 
-def calculateCost(data, fees, dt=1, ind=None):
-    feeCons, feeSupp = fees
-    
+def calculateCost(data, fees, dt=1, ind=None, balance=None):
     # amortizace fve a bat??
     
-    def realCost(ener):
-        ip = ener >= 0.0
-        im = ener <  0.0
-        cost = np.sum((price[ip]+feeCons)*ener[ip]) + np.sum((price[im]+feeSupp)*ener[im])
-        return cost
-    
+    if balance is None:
+        balance = balanceKernel(*selectArrays(data, ind), fees)
     
     if ind is not None:
-        days  = data['Den'][ind].values
-        price = data['Kč/kWh'][ind].values
-        cons  = data['kWh'][ind].values
-        supp  = data['PVkWh'][ind].values
-        batt  = data['BkWh'][ind].values
+        days = data['Den'][ind].values
     else:
-        days  = data['Den'].values
-        price = data['Kč/kWh'].values
-        cons  = data['kWh'].values
-        supp  = data['PVkWh'].values
-        batt  = data['BkWh'].values
+        days = data['Den'].values
     
-    cC   = realCost(cons)
-    cCS  = realCost(cons+supp)
-    cCB  = realCost(cons+batt)
-    cCSB = realCost(cons+supp+batt)
+    cC, _, _, cCS, cCB, cCSB = balance['costTotal']
 
     sCS  = cCS-cC
     sCB  = cCB-cC
@@ -70,7 +103,7 @@ def calculateCost(data, fees, dt=1, ind=None):
     cost['Rozdíl (%)']   = [ 0, srCS, srCB, srCSB]
 
     
-    const = len(price)*dt/24
+    const = balance['hours']*dt/24
     costYear = cost.copy()
     costYear['Náklady (Kč)'] = costYear['Náklady (Kč)']*365/const
     costYear['Rozdíl (Kč)']  = costYear['Rozdíl (Kč)']*365/const
@@ -88,6 +121,21 @@ def calculateCost(data, fees, dt=1, ind=None):
 
 
 
+def groupedCost(data, fees, groups):
+    # Náklady čtyř variant jako v calculateCost pro všechny skupiny řádků najednou.
+    # groups - klíč skupiny pro každý řádek (např. den, ISO týden, měsíc), skupiny nemusí být souvislé.
+    # Vrací seřazené klíče a pole nákladů (skupiny x [spotřeba, +FVE, +baterie, +FVE+baterie]).
+    keys, inv = np.unique(np.asarray(groups), return_inverse=True)
+    
+    price, cons, supp, batt = selectArrays(data)
+    
+    res = np.column_stack([np.bincount(inv.ravel(), weights=costArray(ener, price, fees), minlength=len(keys))
+                           for ener in (cons, cons+supp, cons+batt, cons+supp+batt)])
+    
+    return keys, res
+
+
+
 def printCost(dfcost, show=True):
     df = dfcost.copy()
     
@@ -105,43 +153,18 @@ def printCost(dfcost, show=True):
 
 
 #%% Bilance energie
-def energyBalance(data, dt=1, ind=None):
+def energyBalance(data, dt=1, ind=None, balance=None):
     const = len(data)*dt/24
     
-    if ind is not None:
-        cons  = data['kWh'][ind].values
-        supp  = data['PVkWh'][ind].values
-        batt  = data['BkWh'][ind].values
-    else:
-        cons  = data['kWh'].values
-        supp  = data['PVkWh'].values
-        batt  = data['BkWh'].values
-    
-    cs  = cons+supp
-    cb  = cons+batt
-    csb = cons+supp+batt
+    if balance is None:
+        balance = balanceKernel(*selectArrays(data, ind), (0.0, 0.0))
     
     
     df = pd.DataFrame()
-    df[' '] = ['Pouze spotřeba', 'Pouze FVE', 'Pouze baterie', 'Spotřeba a FVE', 'Spotřeba a baterie', 'Spotřeba, FVE, bat']
-    df['Suma odběr\n(MWh)']    = [np.sum(cons[cons > 0.0]),
-                                  np.sum(supp[supp > 0.0]),
-                                  np.sum(batt[batt > 0.0]),
-                                  np.sum( cs[cs  > 0.0]),
-                                  np.sum( cb[cb  > 0.0]),
-                                  np.sum(csb[csb > 0.0])]
-    df['Suma dodávka\n(MWh)']  = [np.sum(cons[cons < 0.0]),
-                                  np.sum(supp[supp < 0.0]),
-                                  np.sum(batt[batt < 0.0]),
-                                  np.sum( cs[cs  < 0.0]),
-                                  np.sum( cb[cb  < 0.0]),
-                                  np.sum(csb[csb < 0.0])]
-    df['Suma celkem\n(MWh)']   = [np.sum(cons),
-                                  np.sum(supp),
-                                  np.sum(batt),
-                                  np.sum(cs),
-                                  np.sum(cb),
-                                  np.sum(csb)]
+    df[' '] = COMBINATIONS
+    df['Suma odběr\n(MWh)']    = balance['energyIn']
+    df['Suma dodávka\n(MWh)']  = balance['energyOut']
+    df['Suma celkem\n(MWh)']   = balance['energyTotal']
     
     # Převod na kWh na MWh
     df.loc[:, df.columns != ' '] = np.round(df.loc[:, df.columns != ' '] / 1000, 3)
@@ -165,59 +188,19 @@ def costArray(ener, price, fees):
     
     return cost
 
-def financialBalance(data, fees, dt=1, ind=None):
-    feeCons, feeSupp = fees
-    
-    
+def financialBalance(data, fees, dt=1, ind=None, balance=None):
     const = len(data)*dt/24
     
-    if ind is not None:
-        price = data['Kč/kWh'][ind].values
-        cons  = data['kWh'][ind].values
-        supp  = data['PVkWh'][ind].values
-        batt  = data['BkWh'][ind].values
-    else:
-        price = data['Kč/kWh'].values
-        cons  = data['kWh'].values
-        supp  = data['PVkWh'].values
-        batt  = data['BkWh'].values
-    
-    c   = cons
-    s   = supp
-    b   = batt
-    cs  = c+s
-    cb  = c+b
-    csb = c+s+b
-    
-    c_cost   = costArray(c,   price, fees)
-    s_cost   = costArray(s,   price, fees)
-    b_cost   = costArray(b,   price, fees)
-    cs_cost  = costArray(cs,  price, fees)
-    cb_cost  = costArray(cb,  price, fees)
-    csb_cost = costArray(csb, price, fees)
+    if balance is None:
+        balance = balanceKernel(*selectArrays(data, ind), fees)
     
     
     unit = 'tis. Kč'
     df = pd.DataFrame()
-    df[' '] = ['Pouze spotřeba', 'Pouze FVE', 'Pouze baterie', 'Spotřeba a FVE', 'Spotřeba a baterie', 'Spotřeba, FVE, bat']
-    df[f'Suma odběr\n({unit})']    = [np.sum(  c_cost[c   > 0.0]),
-                                      np.sum(  s_cost[s   > 0.0]),
-                                      np.sum(  b_cost[b   > 0.0]),
-                                      np.sum( cs_cost[cs  > 0.0]),
-                                      np.sum( cb_cost[cb  > 0.0]),
-                                      np.sum(csb_cost[csb > 0.0])]
-    df[f'Suma dodávka\n({unit})']  = [np.sum(  c_cost[c   < 0.0]),
-                                      np.sum(  s_cost[s   < 0.0]),
-                                      np.sum(  b_cost[b   < 0.0]),
-                                      np.sum( cs_cost[cs  < 0.0]),
-                                      np.sum( cb_cost[cb  < 0.0]),
-                                      np.sum(csb_cost[csb < 0.0])]
-    df[f'Suma celkem\n({unit})']   = [np.sum(c_cost),
-                                      np.sum(s_cost),
-                                      np.sum(b_cost),
-                                      np.sum(cs_cost),
-                                      np.sum(cb_cost),
-                                      np.sum(csb_cost)]
+    df[' '] = COMBINATIONS
+    df[f'Suma odběr\n({unit})']    = balance['costIn']
+    df[f'Suma dodávka\n({unit})']  = balance['costOut']
+    df[f'Suma celkem\n({unit})']   = balance['costTotal']
     
     
     # Převod na Kč na tis. Kč
@@ -1,101 +1,163 @@
 import pandas as pd
 import numpy as np
 
+import hashlib
+import json
+import os
+import shutil
 
-#%%
-def intersect(dataPath, remove_incomplete_days=True, save=True, consumption_year=None):
-    frames = [pd.read_pickle(dataPath + 'prices.pkl'),
-              pd.read_pickle(dataPath + 'weather.pkl'),
-              pd.read_pickle(dataPath + 'consumption.pkl')]
+import openpyxl
+from datetime import datetime
+from functools import lru_cache
+
+
+#%% Časové rozlišení
+# Data jsou po hodinách (dt = 1), nebo po čtvrthodinách (dt = 0.25) s dalším sloupcem
+# Ctvrthodina (1-4) za sloupcem Hodina. Čtvrthodinová spotřeba je v consumption_15.pkl,
+# hodinové ceny a počasí se na čtvrthodiny rozkládají opakováním hodnoty hodiny.
+
+STEP_COLUMN  = 'Ctvrthodina'
+QUARTER_FILE = 'consumption_15.pkl'
+
+
+def stepsPerHour(dt):
+    if dt == 1:
+        return 1
+    if dt == 0.25:
+        return 4
+    raise ValueError('Podporované časové rozlišení je 1 nebo 0,25 hodiny')
+
+
+def stepKeys(frame):
+    # Čas začátku kroku v celých krocích od epochy (hodiny, nebo čtvrthodiny)
+    keys = frame['Den'].to_numpy().astype('datetime64[h]').astype(np.int64) + frame['Hodina'].to_numpy() - 1
+    if STEP_COLUMN in frame.columns:
+        keys = 4*keys + frame[STEP_COLUMN].to_numpy() - 1
+    return keys
+
+
+def upsample(frame, n):
+    # Rozklad hodinových řádků na n kroků, hodnoty (ceny za kWh, výkony, teploty) se opakují
+    frame = frame.iloc[np.repeat(np.arange(len(frame)), n)].reset_index(drop=True)
+    frame.insert(frame.columns.get_loc('Hodina') + 1, STEP_COLUMN, np.tile(np.arange(1, n+1), len(frame)//n))
+    return frame
+
+
+def consumptionFile(dataPath, dt=1):
+    # Čtvrthodinová spotřeba platí, jen pokud není starší než hodinová (jinak je z jiného výběru)
+    if dt < 1 and os.path.isfile(dataPath + QUARTER_FILE):
+        if os.path.getmtime(dataPath + QUARTER_FILE) >= os.path.getmtime(dataPath + 'consumption.pkl'):
+            return QUARTER_FILE
+    return 'consumption.pkl'
+
+
+def readConsumption(dataPath, dt=1):
+    consumption = pd.read_pickle(dataPath + consumptionFile(dataPath, dt))
     
+    # Jen hodinová data se na čtvrthodiny rozdělí rovnoměrně
+    n = stepsPerHour(dt)
+    if n > 1 and STEP_COLUMN not in consumption.columns:
+        consumption = upsample(consumption, n)
+        consumption['kWh'] = consumption['kWh']/n
+    
+    return consumption
+
+
+
+#%%
+def intersect(dataPath, remove_incomplete_days=True, save=True, consumption_year=None, dt=1):
+    n = stepsPerHour(dt)
+    consumption = readConsumption(dataPath, dt)
     
     if consumption_year is not None:
-        # print(frames[2]['Den'][5])
-        years = [t.year  for t in frames[2]['Den']]
+        # print(consumption['Den'][5])
+        years = consumption['Den'].dt.year.to_numpy()
         
         values, counts = np.unique(years, return_counts=True)
         
         dy = consumption_year - values[np.argmax(counts)]
         if dy != 0:
-            frames[2]['Den'] = frames[2]['Den'] + np.timedelta64(int(np.round((365*dy)/7))*7, 'D')
-            # print(frames[2]['Den'][5])
-        
-    
-    #%
-    ids = [(f['Den'].astype(str) + '_' +  f['Hodina'].astype(str)).to_numpy() for f in frames]
-    
+            consumption['Den'] = consumption['Den'] + np.timedelta64(int(np.round((365*dy)/7))*7, 'D')
+            # print(consumption['Den'][5])
     
-    monolith = np.concatenate(ids)
-    unq, counts = np.unique(monolith, return_counts=True)
-    subset = unq[counts == len(ids)]
     
+    # Ceny a počasí z úložiště jen pro období spotřeby, jinak z připravených pickle souborů
+    storePath = dataPath + STORE_FOLDER
+    if os.path.isfile(storePath + 'manifest.json') and len(consumption):
+        d0, d1 = consumption['Den'].min(), consumption['Den'].max()
+        frames = [storeRange(storePath, 'prices', d0, d1),
+                  storeRange(storePath, 'weather', d0, d1),
+                  consumption]
+    else:
+        frames = [pd.read_pickle(dataPath + 'prices.pkl'),
+                  pd.read_pickle(dataPath + 'weather.pkl'),
+                  consumption]
     
-    inds = [np.intersect1d(idi, subset, return_indices=True)[1] for idi in ids]
-    # _, x_ind, _ = np.intersect1d(ids[0], subset, return_indices=True)
     
+    # Hodinové ceny a počasí na čtvrthodiny
+    if n > 1:
+        frames[:2] = [upsample(f, n) for f in frames[:2]]
     
     
-    #%
-    merged = frames[0].iloc[inds[0]].reset_index(drop=True)
+    #% Klíč řádku je čas začátku kroku v celých krocích od epochy
+    keys = [stepKeys(f) for f in frames]
     
-    for i in range(1, len(ids)):
-        merged = pd.merge(merged, frames[i].iloc[inds[i]].reset_index(drop=True), how = "inner")
+    # Hodina mimo 1-24 (25. hodina dne přechodu na zimní čas) by splynula s hodinou dalšího dne,
+    # do spojení se nebere. Duplicitní klíče jsou nejednoznačné a vynechávají se také.
+    firsts = []
+    for f, key in zip(frames, keys):
+        hour = f['Hodina'].to_numpy()
+        iv = np.where((hour >= 1) & (hour <= 24))[0]
+        unq, ifirst, counts = np.unique(key[iv], return_index=True, return_counts=True)
+        firsts.append((unq[counts == 1], iv[ifirst[counts == 1]]))
     
+    subset = firsts[0][0]
+    for unq, _ in firsts[1:]:
+        subset = np.intersect1d(subset, unq, assume_unique=True)
     
-    days = merged['Den'].values
-    deltas = np.array([pd.Timedelta(hours=h-1) for h in merged['Hodina']])
+    inds = [ifirst[np.searchsorted(unq, subset)] for unq, ifirst in firsts]
     
-    time = [day+delta for day, delta in zip(days, deltas)]
     
-    # merged['t0'] = time
-    merged.insert(0, 't0', time)
+    #% Spojení sloupců, Den a Hodina z prvního zdroje
+    merged = frames[0].iloc[inds[0]].reset_index(drop=True)
     
-    merged = merged.sort_values(by='t0').reset_index(drop=True)
+    for i in range(1, len(frames)):
+        other = frames[i].iloc[inds[i]].reset_index(drop=True)
+        merged = pd.concat((merged, other.drop(columns=[c for c in other.columns if c in merged.columns])), axis=1)
     
-    # Add date-related columns required by process.py
-    import locale
-    try:
-        locale.setlocale(locale.LC_TIME, 'cs_CZ.UTF-8')
-    except:
-        try:
-            locale.setlocale(locale.LC_TIME, 'Czech_Czechia.1250')
-        except:
-            pass  # Use default locale
     
-    # DenNazev - day name (Po, Út, St, Čt, Pá, So, Ne)
-    merged['DenNazev'] = pd.to_datetime(merged['Den']).dt.strftime('%a')
+    time = (subset*(60//n)).astype('datetime64[m]').astype('datetime64[ns]')
     
-    # DenTyden - day of week (1=Monday, 7=Sunday)
-    merged['DenTyden'] = pd.to_datetime(merged['Den']).dt.dayofweek + 1
+    merged.insert(0, 't0', time)
     
-    # DenRok - day of year (1-366)
-    merged['DenRok'] = pd.to_datetime(merged['Den']).dt.dayofyear
     
-    # ISOtyden - ISO week number (1-53)
-    merged['ISOtyden'] = pd.to_datetime(merged['Den']).dt.isocalendar().week
+    # Kalendářní údaje z předpočítané tabulky, spojení přes celočíselný klíč dne
+    day = merged['Den'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    if len(day):
+        calendar = calendarTable(*dayYears(day.min(), day.max()))
+        iday = day - calendar['Den'].to_numpy().astype('datetime64[D]').astype(np.int64)[0]
+    else:
+        calendar = calendarTable()
+        iday = day
     
-    # Svatek - holiday flag (0=workday, 1=holiday)
-    # For now, set weekends as holidays (can be extended with Czech holidays)
-    merged['Svatek'] = (merged['DenTyden'] >= 6).astype(int)
+    for col in ['DenNazev', 'DenTyden', 'DenRok', 'ISOtyden', 'Svatek']:
+        merged[col] = calendar[col].array.take(iday)
     
     # Reorder columns to match expected order
-    cols = ['t0', 'Den', 'DenNazev', 'DenTyden', 'DenRok', 'ISOtyden', 'Svatek', 'Hodina']
+    cols = ['t0', 'Den', 'DenNazev', 'DenTyden', 'DenRok', 'ISOtyden', 'Svatek', 'Hodina'] + ([STEP_COLUMN] if n > 1 else [])
     other_cols = [c for c in merged.columns if c not in cols]
     merged = merged[cols + other_cols]
     
     
     #% Remove incomplete days
     if remove_incomplete_days:
-        udays = np.unique(days)
-        for day in udays:
-            inds = merged['Den'] == day
-            if np.sum(inds) != 24:
-                merged = merged[~inds].reset_index(drop=True)
+        complete = merged.groupby('Den')['Den'].transform('size') == 24*n
+        merged = merged[complete.to_numpy()].reset_index(drop=True)
     
     
     #%
     if save:
-        merged.to_pickle(dataPath + '_intersected.pkl')
+        merged.to_pickle(dataPath + ('_intersected.pkl' if n == 1 else '_intersected_15.pkl'))
     
         time = merged['Den'].values
         form = '%d.%m.%Y'
@@ -113,125 +175,657 @@ def intersect(dataPath, remove_incomplete_days=True, save=True, consumption_year
     return merged
 
 
-def readExcel(dataFile):
-    data = pd.read_excel(dataFile, decimal=',')
-    data = data.dropna(how='any')
+#%% Kalendář
+# Tabulka po dnech (den v týdnu, ISO týden a rok, den v roce, státní svátky) se počítá
+# jednou pro celé století a drží v paměti, názvy dnů nezávisí na locale.
+
+DAY_NAMES = ['Po', 'Út', 'St', 'Čt', 'Pá', 'So', 'Ne']
+
+# Státní svátky s pevným datem (den, měsíc)
+HOLIDAYS_FIXED = [(1, 1), (1, 5), (8, 5), (5, 7), (6, 7), (28, 9), (28, 10), (17, 11), (24, 12), (25, 12), (26, 12)]
+GOOD_FRIDAY_SINCE = 2016
+
+
+def easterSunday(years):
+    # Velikonoční neděle v gregoriánském kalendáři (anonymní algoritmus)
+    y = np.asarray(years, dtype=np.int64)
+    a = y % 19
+    b, c = y // 100, y % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19*a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2*e + 2*i - h - k) % 7
+    m = (a + 11*h + 22*l) // 451
+    month = (h + l - 7*m + 114) // 31
+    day = (h + l - 7*m + 114) % 31 + 1
+    
+    return dateFromParts(y, month, day)
+
+
+def dateFromParts(years, months, days):
+    years, months, days = np.broadcast_arrays(np.asarray(years), np.asarray(months), np.asarray(days))
+    first = (years - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (months - 1)
+    return first.astype('datetime64[D]') + (days - 1)
+
+
+def czechHolidays(years):
+    years = np.asarray(years, dtype=np.int64)
     
-    rename = {'Čas':'Cas',
-              'Datum':'Cas',
-              'Datum a čas':'Cas'
-              # '+A/84000591 [kW]':'kW',
-              # 'Profil +A [kW]':'kW',
-              # 'Činná spotřeba (kW)':'kW'
-              }
+    fixed = [dateFromParts(years, month, day) for day, month in HOLIDAYS_FIXED]
+    easter = easterSunday(years)
     
-    data.rename(columns = rename, inplace = True)
+    # Velký pátek je svátkem od roku 2016, Velikonoční pondělí vždy
+    goodFriday = (easter - 2)[years >= GOOD_FRIDAY_SINCE]
     
+    return np.sort(np.concatenate(fixed + [easter + 1, goodFriday]))
+
+
+def dayYears(day0, day1):
+    y0 = int(np.datetime64(int(day0), 'D').astype('datetime64[Y]').astype(np.int64)) + 1970
+    y1 = int(np.datetime64(int(day1), 'D').astype('datetime64[Y]').astype(np.int64)) + 1970
+    return min(y0, 2000), max(y1, 2099)
+
+
+@lru_cache(maxsize=4)
+def calendarTable(y0=2000, y1=2099):
+    days = np.arange(np.datetime64('%04d-01-01' % y0), np.datetime64('%04d-01-01' % (y1 + 1)))
+    n = days.astype(np.int64)
+    
+    # 1.1.1970 byl čtvrtek, pondělí = 0
+    weekday = (n + 3) % 7
+    
+    year = days.astype('datetime64[Y]')
+    dayOfYear = (days - year.astype('datetime64[D]')).astype(np.int64) + 1
+    
+    # ISO týden patří roku, do kterého padne jeho čtvrtek
+    thursday = days - weekday + 3
+    isoYear = thursday.astype('datetime64[Y]')
+    isoWeek = (thursday - isoYear.astype('datetime64[D]')).astype(np.int64) // 7 + 1
+    
+    holiday = np.isin(days, czechHolidays(np.arange(y0, y1 + 1)))
+    
+    return pd.DataFrame({'Den': days.astype('datetime64[ns]'),
+                         'DenNazev': np.array(DAY_NAMES, dtype=object)[weekday],
+                         'DenTyden': (weekday + 1).astype(np.int32),
+                         'DenRok': dayOfYear.astype(np.int32),
+                         'ISOtyden': pd.array(isoWeek.astype(np.uint32), dtype='UInt32'),
+                         'ISOrok': (isoYear.astype(np.int64) + 1970).astype(np.int32),
+                         'StatniSvatek': holiday.astype(np.int64),
+                         # Svatek - nepracovní den (0=pracovní den, 1=víkend nebo státní svátek)
+                         'Svatek': ((weekday >= 5) | holiday).astype(np.int64)})
+
+
+
+# Kompaktní tabulka: kalendářní sloupce v malých celých typech, názvy dnů jako kategorie,
+# reálné sloupce ve float32. Ostatní sloupce (časy) zůstávají beze změny.
+COMPACT_INT = {'DenTyden': np.int8, 'DenRok': np.int16, 'ISOtyden': np.int8, 'Svatek': np.int8, 
+               'StatniSvatek': np.int8, 'Hodina': np.int8, STEP_COLUMN: np.int8}
+
+
+def compactFrame(data):
+    columns = {}
+    for name in data.columns:
+        col = data[name]
+        if name in COMPACT_INT:
+            columns[name] = col.to_numpy(dtype=COMPACT_INT[name])
+        elif name == 'DenNazev':
+            columns[name] = pd.Categorical(col.to_numpy(), categories=DAY_NAMES)
+        elif col.dtype == np.float64:
+            columns[name] = col.to_numpy(dtype=np.float32)
+        else:
+            columns[name] = col.to_numpy()
     
-    nkWh = [n for n in data.columns if 'kwh' in n.lower()]
-    nkW  = [n for n in data.columns if 'kw' in n.lower()]
+    return pd.DataFrame(columns)
+
+
+TIME_COLUMNS = {'Čas':'Cas',
+                'Datum':'Cas',
+                'Datum a čas':'Cas'
+                # '+A/84000591 [kW]':'kW',
+                # 'Profil +A [kW]':'kW',
+                # 'Činná spotřeba (kW)':'kW'
+                }
+
+NA_VALUES = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN', 
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
+
+
+def valueColumn(columns):
+    nkWh = [n for n in columns if 'kwh' in n.lower()]
+    nkW  = [n for n in columns if 'kw' in n.lower()]
     
     if any(nkWh):
         if len(nkWh) > 1:
             print('')
             print('POZOR: Nalezeno více sloupců s jednotkou "kWh" v názvu!')
             print('Zpracovává se první v pořadí')
-        data.rename(columns = {nkWh[0]: 'kWh'}, inplace = True)
+        return nkWh[0], 'kWh'
     elif any(nkW):
         if len(nkW) > 1:
             print('')
             print('POZOR: Nalezeno více sloupců s jednotkou "kW" v názvu!')
             print('Zpracovává se první v pořadí')
-        data.rename(columns = {nkW[0]: 'kW'}, inplace = True)
+        return nkW[0], 'kW'
     else:
         raise Exception('Nenalezen žádný sloupec s jednotkou "kWh" nebo "kW" v názvu')
+
+
+def readExcel(dataFile, dt=1):
+    return hourlyEnergy(*excelSeries(dataFile), dt)
+
+
+def excelSeries(dataFile):
+    data = pd.read_excel(dataFile, decimal=',')
+    data = data.dropna(how='any')
+    
+    data.rename(columns = TIME_COLUMNS, inplace = True)
+    
+    name, unit = valueColumn(data.columns)
+    data.rename(columns = {name: unit}, inplace = True)
         
     
-    if data['Cas'].dtype == 'object':
+    if not pd.api.types.is_datetime64_any_dtype(data['Cas']):
         try:
             data['Cas'] = pd.to_datetime(data['Cas'], format='%d.%m.%Y %H:%M')
         except ValueError:
             raise ValueError('Špatný formát času')
     
+    return data['Cas'].to_numpy(), data[unit].to_numpy(), unit
+
+
+def hourlyEnergy(t, values, unit='kWh', dt=1):
+    # Hodinová (dt = 0.25 čtvrthodinová) energie z odečtů s časem konce intervalu,
+    # společné pro celé i proudové čtení
+    data = pd.DataFrame({'Cas': t, unit: values})
+    n = stepsPerHour(dt)
+    
     
     # To CET time without DST
-    dt = np.diff(data['Cas'].values)/np.timedelta64(60, 's')
-    # dts = np.unique(dt)
+    # Letní čas začíná za krokem delším o hodinu a končí krokem kratším o hodinu, u víceletých
+    # exportů platí každý přechod. Bez úvodního přechodu do letního času se posouvá od druhého
+    # řádku, bez návratu do konce dat, první a poslední řádek se neposouvá (jako dosud).
+    dtime = np.diff(data['Cas'].values)/np.timedelta64(60, 's')
     
-    dtm = int(np.round(dt.mean()))
+    dtm = int(np.round(dtime.mean()))
     
-    if dtm == 15:
-        isummer = np.where(dt ==  75)[0]
-    elif dtm == 60:
-        isummer = np.where(dt ==  120)[0]
+    t = data['Cas'].to_numpy(copy=True)
     
-    if np.any(isummer):
-        isummer = isummer[0]
-    else:
-        isummer = 0
+    event = np.zeros(len(t), dtype=int)
+    event[np.where(dtime == dtm+60)[0]+1] =  1
+    event[np.where(dtime == dtm-60)[0]+1] = -1
     
+    iEvent = np.where(event != 0)[0]
+    startSummer = not (len(iEvent) and event[iEvent[0]] == 1)
     
-    if dtm == 15:
-        iwinter = np.where(dt == -45)[0]
-    elif dtm == 60:
-        iwinter = np.where(dt == 0)[0]
-
-    if np.any(iwinter):
-        iwinter = iwinter[0]
-    else:
-        iwinter = len(dt)-1
+    last = np.maximum.accumulate(np.where(event != 0, np.arange(len(t)), -1))
+    summer = np.where(last >= 0, event[np.maximum(last, 0)] == 1, startSummer)
+    summer[[0, -1]] = False
     
-    t = data['Cas'].values
-    t[isummer+1:iwinter+1] = t[isummer+1:iwinter+1] - np.timedelta64(3600, 's')
+    t[summer] = t[summer] - np.timedelta64(3600, 's')
     
     data['Cas'] = t
     
-    dt = np.diff(data['Cas'].values)/np.timedelta64(60, 's')
-    # dts = np.unique(dt)
-    
     
     
-    data['Datum'] = (data['Cas'] - pd.Timedelta(1, 's')).dt.date
-    # data['Datum'] = [tim.date() for tim in (data['Cas'] - pd.Timedelta(1, 's'))]
-    data['Datum'] = pd.to_datetime(data['Datum'])
-    data['Hodina'] = [tim.hour+1 for tim in (data['Cas'] - pd.Timedelta(1, 's'))]
+    tEnd = data['Cas'] - pd.Timedelta(1, 's')
+    data['Datum'] = tEnd.dt.normalize()
+    data['Hodina'] = (tEnd.dt.hour + 1).astype('int64')
     
+    groups = ['Datum', 'Hodina']
+    if n > 1:
+        data[STEP_COLUMN] = (tEnd.dt.minute // (60//n) + 1).astype('int64')
+        groups.append(STEP_COLUMN)
     
     
-    #%
-    agregated = pd.DataFrame()
-    days = np.unique(data['Datum'].to_numpy())
     
+    #% Agregace po hodinách (čtvrthodinách), všechny dny mají všechny hodiny vyskytující se v datech
     sumORmean = 1 if 'kWh' in data.columns else 0
     
-    for day in days:
-        sub = data[data['Datum'] == day].reset_index(drop=True)
-        hours = np.unique(data['Hodina'].to_numpy()) # nemá být sub['Hodina']? viz KOWAC
+    if sumORmean:
+        energy = data.groupby(groups)['kWh'].sum()
+    else:
+        # Průměrný výkon v kW na energii kroku v kWh
+        energy = data.groupby(groups)['kW'].mean()*dt
+    
+    days  = np.unique(data['Datum'].to_numpy())
+    hours = np.unique(data['Hodina'].to_numpy())
+    if n > 1:
+        index = pd.MultiIndex.from_product([days, hours, np.arange(1, n+1)], names=['Den', 'Hodina', STEP_COLUMN])
+    else:
+        index = pd.MultiIndex.from_product([days, hours], names=['Den', 'Hodina'])
+    
+    # Chybějící hodina je při sčítání nula, u průměru NaN
+    energy = energy.reindex(index, fill_value=0 if sumORmean else np.nan)
+    
+    agregated = energy.rename('kWh').reset_index()
+    
+    
         
-        if sumORmean:
-            energy = [np.sum(sub['kWh'][sub['Hodina'] == h]) for h in hours]
+    #% Remove days with NaNs
+    nanDays = agregated['Den'][np.isnan(agregated['kWh'].values)].unique()
+    agregated = agregated[~agregated['Den'].isin(nanDays)].reset_index(drop=True)
+    
+    return agregated
+
+
+
+#%% Proudové čtení velkých souborů
+# Velké exporty (víceleté 15minutové diagramy) se nečtou celé do pandas. Řádky se procházejí
+# postupně (openpyxl read-only, read_csv po blocích) a ukládají jen jako pole času a hodnoty,
+# výsledek je stejná hodinová tabulka jako z readExcel.
+
+def parseTime(cell):
+    if isinstance(cell, str):
+        return datetime.strptime(cell.strip(), '%d.%m.%Y %H:%M')
+    return cell
+
+
+def parseValue(cell):
+    if isinstance(cell, str):
+        return float(cell.strip().replace(',', '.'))
+    return float(cell)
+
+
+def isMissing(cell):
+    if cell is None:
+        return True
+    if isinstance(cell, str):
+        return cell.strip() in NA_VALUES
+    if isinstance(cell, float):
+        return cell != cell
+    return False
+
+
+def streamXlsx(dataFile, chunkRows):
+    wb = openpyxl.load_workbook(dataFile, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        
+        header = next(rows, None)
+        if header is None:
+            raise Exception('Prázdný soubor')
+        
+        # Prázdné sloupce za hlavičkou (jen formátované buňky) pandas také vynechává
+        header = list(header)
+        while header and header[-1] is None:
+            header.pop()
+        columns = [str(h) if h is not None else 'Unnamed: %d' % i for i, h in enumerate(header)]
+        width = len(columns)
+        
+        renamed = [TIME_COLUMNS.get(c, c) for c in columns]
+        if 'Cas' not in renamed:
+            raise Exception('Nenalezen sloupec s časem')
+        iTime = renamed.index('Cas')
+        name, unit = valueColumn(renamed)
+        iValue = renamed.index(name)
+        yield unit
+        
+        times, values = [], []
+        for row in rows:
+            row = row[:width]
+            # Jako dropna(how='any'), chybějící buňka v kterémkoli sloupci vyřadí řádek
+            if len(row) < width or any(isMissing(c) for c in row):
+                continue
+            
+            try:
+                times.append(parseTime(row[iTime]))
+            except ValueError:
+                raise ValueError('Špatný formát času')
+            values.append(parseValue(row[iValue]))
+            
+            if len(times) >= chunkRows:
+                yield np.array(times, dtype='datetime64[ns]'), np.array(values, dtype=float)
+                times, values = [], []
+        
+        if times:
+            yield np.array(times, dtype='datetime64[ns]'), np.array(values, dtype=float)
+    finally:
+        wb.close()
+
+
+def streamCsv(dataFile, chunkRows):
+    with open(dataFile, 'rb') as f:
+        head = f.read(1 << 16)
+    try:
+        head.decode('utf-8')
+        encoding = 'utf-8-sig'
+    except UnicodeDecodeError:
+        encoding = 'cp1250'
+    
+    # Český export má středník a desetinnou čárku
+    line = head.decode(encoding, errors='ignore').splitlines()[0]
+    sep, decimal = (';', ',') if line.count(';') >= line.count(',') else (',', '.')
+    
+    unit = None
+    for chunk in pd.read_csv(dataFile, sep=sep, decimal=decimal, encoding=encoding, chunksize=chunkRows):
+        chunk = chunk.dropna(how='any').rename(columns=TIME_COLUMNS)
+        
+        if unit is None:
+            if 'Cas' not in chunk.columns:
+                raise Exception('Nenalezen sloupec s časem')
+            name, unit = valueColumn(chunk.columns)
+            yield unit
+        
+        try:
+            t = pd.to_datetime(chunk['Cas'], format='%d.%m.%Y %H:%M')
+        except ValueError:
+            raise ValueError('Špatný formát času')
+        
+        yield t.to_numpy(dtype='datetime64[ns]'), chunk[name].to_numpy(dtype=float)
+
+
+def readSeries(dataFile, chunkRows=65536):
+    # Odečty souboru jako pole (čas konce intervalu, hodnota) a jednotka
+    ext = dataFile.split('.')[-1].lower()
+    if ext == 'xlsx':
+        stream = streamXlsx(dataFile, chunkRows)
+    elif ext == 'csv':
+        stream = streamCsv(dataFile, chunkRows)
+    else:
+        # Starý formát xls openpyxl nečte
+        return excelSeries(dataFile)
+    
+    unit = next(stream)
+    
+    times, values = [np.array([], dtype='datetime64[ns]')], [np.array([], dtype=float)]
+    for t, v in stream:
+        times.append(t)
+        values.append(v)
+    
+    return np.concatenate(times), np.concatenate(values), unit
+
+
+def readStream(dataFile, chunkRows=65536, dt=1):
+    return hourlyEnergy(*readSeries(dataFile, chunkRows), dt)
+
+
+#%% Cache připravených dat
+# Výstup intersect se ukládá po sloupcích do samostatných .npy souborů, které se čtou
+# přes memory-map. Klíčem je SHA-256 zdrojových souborů (stejný otisk jako File.checksum
+# v backendu) a parametry spojení, při shodě se příprava dat úplně přeskočí.
+
+CACHE_VERSION = 3
+CACHE_SOURCES = ['prices.pkl', 'weather.pkl'] # + soubor spotřeby podle rozlišení (consumptionFile)
+
+
+def fileChecksum(path, memo=None):
+    stat = os.stat(path)
+    name = os.path.basename(path)
+    
+    # Otisk se přepočítává jen při změně velikosti nebo času úpravy souboru
+    if memo is not None:
+        known = memo.get(name)
+        if known is not None and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return known[2]
+    
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    checksum = h.hexdigest()
+    
+    if memo is not None:
+        memo[name] = [stat.st_size, stat.st_mtime_ns, checksum]
+    
+    return checksum
+
+
+def cacheKey(checksums, consumption_year=None, remove_incomplete_days=True, dt=1):
+    if consumption_year is not None:
+        consumption_year = int(consumption_year)
+    
+    key = json.dumps({'version': CACHE_VERSION,
+                      'checksums': list(checksums),
+                      'consumption_year': consumption_year,
+                      'remove_incomplete_days': bool(remove_incomplete_days),
+                      'dt': float(dt)})
+    
+    return hashlib.sha256(key.encode('utf8')).hexdigest()
+
+
+def saveColumns(data, path):
+    tmp = path + '.tmp%d' % os.getpid()
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    
+    columns = []
+    for i, name in enumerate(data.columns):
+        col = data[name]
+        dtype = str(col.dtype)
+        
+        if col.dtype == object or dtype in ['str', 'string']:
+            arr = np.asarray(col.to_numpy(), dtype=str)
+        elif isinstance(col.dtype, pd.api.extensions.ExtensionDtype) and hasattr(col.dtype, 'numpy_dtype'):
+            arr = col.to_numpy(dtype=col.dtype.numpy_dtype)
         else:
-            energy = [np.mean(sub['kW'][sub['Hodina'] == h]) for h in hours]
+            arr = col.to_numpy()
+        
+        np.save(os.path.join(tmp, 'c%d.npy' % i), arr, allow_pickle=False)
+        columns.append([name, dtype])
     
-        dummy = pd.DataFrame()
-        dummy['kWh'] = energy
-        dummy['Hodina'] = hours
-        dummy['Den'] = day
+    with open(os.path.join(tmp, 'columns.json'), 'w', encoding='utf8') as f:
+        json.dump({'rows': len(data), 'columns': columns}, f, ensure_ascii=False)
+    
+    # Přejmenování adresáře je atomické, souběžný výpočet nikdy nenačte nedopsanou cache
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def loadColumns(path):
+    with open(os.path.join(path, 'columns.json'), 'r', encoding='utf8') as f:
+        meta = json.load(f)
+    
+    columns = {}
+    for i, (name, dtype) in enumerate(meta['columns']):
+        arr = np.load(os.path.join(path, 'c%d.npy' % i), mmap_mode='r', allow_pickle=False)
         
-        dummy = dummy[['Den', 'Hodina', 'kWh']]
+        if str(arr.dtype) == dtype:
+            columns[name] = arr
+        else:
+            columns[name] = pd.array(arr, dtype=dtype)
+    
+    return pd.DataFrame(columns)
+
+
+def preparedKey(dataPath, remove_incomplete_days=True, consumption_year=None, cachePath=None, dt=1):
+    if cachePath is None:
+        cachePath = dataPath + '_cache/'
+    os.makedirs(cachePath, exist_ok=True)
+    
+    memoPath = cachePath + 'checksums.json'
+    try:
+        with open(memoPath, 'r', encoding='utf8') as f:
+            memo = json.load(f)
+    except (OSError, ValueError):
+        memo = {}
+    if not isinstance(memo, dict):
+        memo = {}
+    known = dict(memo)
+    
+    # Při existujícím úložišti cen a počasí stačí otisk jeho manifestu
+    sources = CACHE_SOURCES
+    if os.path.isfile(dataPath + STORE_FOLDER + 'manifest.json'):
+        sources = [STORE_FOLDER + 'manifest.json']
+    sources = sources + [consumptionFile(dataPath, dt)]
+    
+    checksums = [fileChecksum(dataPath + name, memo) for name in sources]
+    
+    # Zapisuje se jen změněný seznam, přes dočasný soubor a přejmenování (souběžné výpočty
+    # nikdy nenačtou rozepsaný soubor)
+    if memo != known:
+        tmp = memoPath + '.tmp%d' % os.getpid()
+        try:
+            with open(tmp, 'w', encoding='utf8') as f:
+                json.dump(memo, f)
+            os.replace(tmp, memoPath)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    
+    return cacheKey(checksums, consumption_year, remove_incomplete_days, dt)
+
+
+def intersectCached(dataPath, remove_incomplete_days=True, consumption_year=None, 
+                    cachePath=None, maxEntries=8, key=None, dt=1):
+    if cachePath is None:
+        cachePath = dataPath + '_cache/'
+    
+    if key is None:
+        key = preparedKey(dataPath, remove_incomplete_days, consumption_year, cachePath, dt)
+    
+    path = cachePath + key
+    
+    if os.path.isfile(os.path.join(path, 'columns.json')):
+        os.utime(path)
+        return loadColumns(path)
+    
+    data = intersect(dataPath, remove_incomplete_days, False, consumption_year, dt)
+    saveColumns(data, path)
+    
+    # Nejdéle nepoužité záznamy nad limit se mažou
+    entries = [cachePath + e for e in os.listdir(cachePath) if os.path.isfile(os.path.join(cachePath + e, 'columns.json'))]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for e in entries[maxEntries:]:
+        shutil.rmtree(e, ignore_errors=True)
+    
+    return data
+
+
+
+#%% Úložiště cen a počasí
+# Víceleté úložiště v data_ready/store/, každý druh dat (prices, weather) je rozdělen
+# po letech do sloupcových oddílů (saveColumns), řádky seřazené podle času. Zdrojové soubory
+# se normalizují jednou při vložení, manifest drží jejich otisky, takže opakované vložení
+# stejného souboru nic nedělá. Časy jsou jako u spotřeby ve středoevropském čase bez letního.
+
+STORE_FOLDER = 'store/'
+STORE_KINDS = {'prices': ['EUR/kWh', 'Kč/kWh'],
+               'weather': ['Tamb', 'GHI', 'WindVel']}
+
+
+def readPrices(dataFile):
+    data = pd.read_excel(dataFile)
+    
+    if '(EUR/MWh)' in data.columns:
+        data['EUR/kWh'] = data['(EUR/MWh)'] / 1000
+        data['Kč/kWh'] = data['(Kč/MWh)'] / 1000
+    
+    data = data[['Den', 'Hodina'] + STORE_KINDS['prices']].dropna(how='any')
+    data['Den'] = pd.to_datetime(data['Den']).dt.normalize()
+    
+    return data
+
+
+def readWeather(dataFile):
+    if dataFile.lower().endswith('.csv'):
+        # Export Solcast, hlavička s popisem místa, druhý řádek jsou jednotky, časová zóna UTC+1
+        data = pd.read_csv(dataFile, comment='#')
+        data = data.apply(pd.to_numeric, errors='coerce').dropna(subset=['Year', 'Month', 'Day', 'Hour'])
         
-        agregated = pd.concat([agregated, dummy]).reset_index(drop=True)
+        t = pd.to_datetime(data[['Year', 'Month', 'Day', 'Hour']].astype(int))
+    else:
+        # Export Solcast API, časy v UTC, krok 30 nebo 60 minut
+        data = pd.read_excel(dataFile)
+        data = data.rename(columns={'AirTemp': 'Tamb', 'Ghi': 'GHI', 'WindSpeed10m': 'WindVel'})
+        
+        t = pd.to_datetime(data['PeriodStart'], utc=True).dt.tz_localize(None) + pd.Timedelta(1, 'h')
+    
+    # Začátek intervalu určuje hodinu, kratší intervaly se průměrují
+    t = t.dt.floor('h')
+    data = data[STORE_KINDS['weather']].astype(float)
+    data['Den'] = t.dt.normalize().to_numpy()
+    data['Hodina'] = (t.dt.hour + 1).to_numpy().astype('int64')
     
+    data = data.groupby(['Den', 'Hodina'], as_index=False)[STORE_KINDS['weather']].mean()
     
+    return data
+
+
+def storeKey(data):
+    return data['Den'].to_numpy().astype('datetime64[h]').astype(np.int64) + data['Hodina'].to_numpy() - 1
+
+
+def storeManifest(storePath):
+    try:
+        with open(storePath + 'manifest.json', 'r', encoding='utf8') as f:
+            return json.load(f)
+    except OSError:
+        return {'files': {}, 'years': {kind: [] for kind in STORE_KINDS}}
+
+
+def storeIngest(storePath, files):
+    os.makedirs(storePath, exist_ok=True)
+    manifest = storeManifest(storePath)
+    
+    for dataFile in files:
+        name = os.path.basename(dataFile)
+        checksum = fileChecksum(dataFile)
+        if manifest['files'].get(name) == checksum:
+            continue
         
-    #% Remove days with NaNs
-    nans = np.isnan(agregated['kWh'].values)
-    while np.any(nans):
-        nansi = np.where(nans)[0]
-        agregated = agregated.drop(agregated.index[agregated['Den']==agregated['Den'][nansi[0]]])
-        agregated = agregated.reset_index(drop=True)
-        nans = np.isnan(agregated['kWh'].values)
+        if name.lower().startswith('ceny'):
+            kind, new = 'prices', readPrices(dataFile)
+        elif name.lower().startswith('pocasi'):
+            kind, new = 'weather', readWeather(dataFile)
+        else:
+            print('Neznámý druh souboru, přeskakuje se : ' + name)
+            continue
+        
+        print('Vkládá se soubor : ' + name)
+        # 25. hodina dne přechodu na zimní čas by splynula s první hodinou dalšího dne
+        new = new.loc[(new['Hodina'] >= 1) & (new['Hodina'] <= 24), ['Den', 'Hodina'] + STORE_KINDS[kind]]
+        new['Den'] = new['Den'].astype('datetime64[ns]')
+        new['Hodina'] = new['Hodina'].astype('int64')
+        newYears = new['Den'].dt.year.to_numpy()
+        
+        # Dotčené roky se sloučí s uloženými daty, novější soubor má přednost
+        for year in np.unique(newYears).tolist():
+            part = new[newYears == year]
+            path = storePath + '%s/%d' % (kind, year)
+            if year in manifest['years'][kind]:
+                part = pd.concat((loadColumns(path), part), ignore_index=True)
+            
+            key = storeKey(part)
+            order = np.argsort(key, kind='stable')
+            _, ilast = np.unique(key[order][::-1], return_index=True)
+            part = part.iloc[order[::-1][ilast]].reset_index(drop=True)
+            
+            os.makedirs(storePath + kind, exist_ok=True)
+            shutil.rmtree(path, ignore_errors=True)
+            saveColumns(part, path)
+            
+            if year not in manifest['years'][kind]:
+                manifest['years'][kind] = sorted(manifest['years'][kind] + [year])
+        
+        manifest['files'][name] = checksum
+        
+        with open(storePath + 'manifest.json', 'w', encoding='utf8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
     
-    return agregated
+    return manifest
 
 
+def storeRange(storePath, kind, t0, t1):
+    t0 = np.datetime64(t0, 'D')
+    t1 = np.datetime64(t1, 'D')
+    
+    manifest = storeManifest(storePath)
+    y0, y1 = t0.astype('datetime64[Y]').astype(int) + 1970, t1.astype('datetime64[Y]').astype(int) + 1970
+    years = [y for y in manifest['years'][kind] if y0 <= y <= y1]
+    
+    if not any(years):
+        return pd.DataFrame({'Den': np.array([], dtype='datetime64[ns]'), 'Hodina': np.array([], dtype=np.int64)} |
+                            {c: np.array([], dtype=float) for c in STORE_KINDS[kind]})
+    
+    parts = [loadColumns(storePath + '%s/%d' % (kind, y)) for y in years]
+    data = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
+    
+    # Oddíly jsou seřazené podle dne, stačí oříznout okraje
+    day = data['Den'].to_numpy()
+    i0, i1 = np.searchsorted(day, np.array([t0, t1 + np.timedelta64(1, 'D')], dtype=day.dtype))
+    
+    return data.iloc[i0:i1].reset_index(drop=True)
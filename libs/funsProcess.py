@@ -1,5 +1,14 @@
 import numpy as np
-from scipy.optimize import linprog
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import cpu_count
+
+from scipy import sparse
+from scipy.optimize import linprog, milp, LinearConstraint, Bounds
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
 
 # https://www.researchgate.net/figure/Relationship-between-GHI-W-m-2-and-PV-Power-Watts-determined-at-NREL_fig1_331175630
 # https://www.hukseflux.com/applications/solar-energy-pv-system-performance-monitoring/how-to-calculate-pv-performance-ratio
@@ -14,6 +23,15 @@ def checkTimeline(time, dt_norm):
     return np.all(dtime == dt_norm)
 
 
+def timelineSegments(time, dt_norm):
+    # Souvislé úseky časové řady jako dvojice indexů (začátek, konec)
+    dtime = np.diff(time)/np.timedelta64(3600, 's')
+    breaks = np.where(dtime != dt_norm)[0] + 1
+    starts = np.concatenate(([0], breaks))
+    stops  = np.concatenate((breaks, [len(time)]))
+    return list(zip(starts, stops))
+
+
 
 def getEpEnLimits(N, suma, Pmax, B_params, dt, conditions=None):
     _, _, _, B_effCharge,   B_effDischarge, \
@@ -79,199 +97,309 @@ def getEpEnLimits(N, suma, Pmax, B_params, dt, conditions=None):
 
 
 
-#%% Optimalizace průběhu baterie
-def battOptPriceLosses(price, cons, supp, Pmax, E0, B_params, dt, fees=None, conditions=None):
-    B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
-                         B_speedCharge, B_speedDischarge = B_params
-
-    if fees:
-        feeCons, feeSupp  = fees
-    else:
-        feeCons, feeSupp = 0.0, 0.0
-
-
-    N = len(price)
-    if B_cap <= 0.0:
-        return np.zeros((N,)), False
-
-    cp = price + feeCons
-    cn = price + feeSupp
-    suma = cons+supp
+def windowStarts(days, hours, cadence=24, startHour=12, quarters=None):
+    # Začátky oken klouzavé optimalizace: každých cadence hodin od startHour (hodina začátku
+    # intervalu, Hodina = startHour + 1). Počítá se od pevného dne, aby začátky nezávisely
+    # na začátku dat ani na dírách v časové ose. quarters - čtvrthodina (1-4) u 15minutových dat.
+    day = (np.asarray(days, dtype='datetime64[D]') - np.datetime64('2000-01-01', 'D')).astype(np.int64)
+    elapsed = 24*day + np.asarray(hours, dtype=np.int64) - 1 - startHour
     
+    n = 1
+    if quarters is not None:
+        n = 4
+        elapsed = n*elapsed + np.asarray(quarters, dtype=np.int64) - 1
     
-    lp = 1/B_effCharge
-    ln = B_effDischarge
+    return np.where(elapsed % int(round(cadence*n)) == 0)[0]
 
-    c = np.zeros(5*N)
-    c[-N:] = 1
-    suma = cons+supp
-    
-    I = np.eye(N)
-    Z = np.zeros((N,N))
-    T = np.tri(N)
-    Dcp = np.diag(cp)
-    Dcn = np.diag(cn)
 
-    
-    bub1 =  np.full((N,), B_cap*B_max - E0)
-    bub2 = -np.full((N,), B_cap*B_min - E0)
-    
-    Aub = np.vstack((np.column_stack(( T,  T, Z, Z, Z)), 
-                     np.column_stack((-T, -T, Z, Z, Z))))
-    bub = np.concatenate((bub1, bub2))
-    
-    
-    Aeq = np.vstack((np.column_stack((lp*I, ln*I,  -I,  -I,  Z)), 
-                     np.column_stack((   Z,    Z, Dcp, Dcn, -I))))
-    beq = np.concatenate((-suma, np.zeros(N)))
-    
-    
 
-    lims = getEpEnLimits(N, suma, Pmax, B_params, dt, conditions)
-    bXpLo, bXpHi, bXnLo, bXnHi = lims
-    
-    bXlo =  list(bXpLo)
-    bXlo += list(bXnLo)
-    bXlo += [0] * N
-    bXlo += [None] * N
-    bXlo += [None] * N
 
-    bXhi =  list(bXpHi)
-    bXhi += list(bXnHi)
-    bXhi += [None] * N
-    bXhi += [0] * N
-    bXhi += [None] * N
+def windowTable(time, starts, Nhours, dt_norm, predictionWeeks=1):
+    # Tabulka oken pro klouzavou optimalizaci: začátek okna, začátek okna se zdrojem
+    # predikce spotřeby a platnost (obě okna jsou celá v datech a bez děr v časové ose).
+    # Zdrojem predikce je stejný čas o predictionWeeks týdnů dříve, nikdy pozdější data.
+    # Okna na začátku dat bez zdroje jsou neplatná. predictionWeeks=0 - zdrojem je okno samo.
+    L = len(time)
+    starts = np.asarray(starts)
     
-    bX = [(lo, hi) for lo, hi in zip(bXlo, bXhi)]
+    # Počet děr v časové ose před každým řádkem, okno je souvislé při stejném počtu na obou koncích
+    stepOk = np.diff(time)/np.timedelta64(3600, 's') == dt_norm
+    breaks = np.concatenate(([0], np.cumsum(~stepOk)))
     
+    def isValid(i):
+        iLast = np.clip(i + Nhours - 1, 0, L - 1)
+        return (i >= 0) & (i + Nhours <= L) & (breaks[iLast] == breaks[np.maximum(i, 0)])
     
-    res = linprog(c, A_ub=Aub, b_ub=bub, A_eq=Aeq, b_eq=beq, bounds=bX)
-
-    
-    success = res.success
-    if success:
-        battOpt = res.x[:N] + res.x[N:2*N]
+    if predictionWeeks:
+        target = time[starts] - np.timedelta64(7*predictionWeeks, 'D')
+        
+        order = np.argsort(time, kind='stable')
+        pos = np.minimum(np.searchsorted(time[order], target), L - 1)
+        sources = np.where(time[order][pos] == target, order[pos], -1)
     else:
-        battOpt = np.zeros((N,))
+        sources = starts.copy()
     
-    return battOpt, success
+    valid = isValid(starts) & isValid(sources)
+    return starts, sources, valid
 
 
 
-def battOptPeaksLosses(consPred, suppPred, Pmax, E0, B_params, dt, conditions=None):
-    B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
-                         B_speedCharge, B_speedDischarge = B_params
+def windowCoverage(starts, Nhours, L):
+    # Řádky pokryté alespoň jedním oknem délky Nhours se začátky starts (maska délky L)
+    cover = np.zeros(L + 1, dtype=np.int64)
+    np.add.at(cover, np.asarray(starts, dtype=np.int64), 1)
+    np.add.at(cover, np.minimum(np.asarray(starts, dtype=np.int64) + Nhours, L), -1)
+    
+    return np.cumsum(cover[:L]) > 0
 
-    N = len(consPred)
-    if B_cap <= 0.0:
-        return np.zeros((N,)), False
 
 
-    lp = 1/B_effCharge
-    ln = B_effDischarge
 
-    c = np.zeros(2*N+1)
-    c[-1] = 1
-    suma = consPred+suppPred
+def getBounds(N, suma, Pmax, B_params, dt, conditions=None):
+    _, _, _, B_effCharge,   B_effDischarge, \
+             B_speedCharge, B_speedDischarge = B_params
 
-    I = np.eye(N)
-    # Z = np.zeros((N,N))
-    T = np.tri(N)
+    if conditions:
+        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot  = conditions
+    else:
+        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot = True, True, True
 
 
-    b0 = -suma
-    b1 =  np.full((N,), B_cap*B_max - E0)
-    b2 = -np.full((N,), B_cap*B_min - E0)
     
-    Aub = np.vstack((np.column_stack(( lp*I,   ln*I, -np.ones(N))), 
-                     np.column_stack((    T,      T,  np.zeros(N))), 
-                     np.column_stack((   -T,     -T,  np.zeros(N)))))
-    bub = np.concatenate((b0, b1, b2))
+    if allowBatt2Network and allowPmaxOvershoot:
+        bLo = np.full((N), -B_speedDischarge*dt)
+    elif allowBatt2Network:
+        bLo = np.max(np.column_stack(((Pmax[0]*dt - suma)/B_effDischarge, 
+                                         np.full(N, -B_speedDischarge*dt))), axis=1)
 
-    
+        ind = bLo > 0.0
+        if np.any(ind):
+            bLo[ind] = 0.0
 
-    lims = getEpEnLimits(N, suma, Pmax, B_params, dt, conditions)
-    bXpLo, bXpHi, bXnLo, bXnHi = lims
+    else:
+        sumalo = suma.copy()
+        sumalo[sumalo < 0.0] = 0.0    
+        bLo = np.max(np.column_stack((-sumalo/B_effDischarge, 
+                                       np.full(N, -B_speedDischarge*dt))), axis=1)
+        
 
     
-    bXlo =  list(bXpLo)
-    bXlo += list(bXnLo)
-    bXlo.append(0)
+    if allowNet2Batt and allowPmaxOvershoot:
+        bHi = np.full((N), B_speedCharge*dt)
+    elif allowNet2Batt:
+        bHi = np.min(np.column_stack(((Pmax[1]*dt - suma)*B_effCharge, 
+                                       np.full(N, B_speedCharge*dt))), axis=1)
 
-    bXhi =  list(bXpHi)
-    bXhi += list(bXnHi)
-    bXhi.append(None)
-    
-    bX = [(lo, hi) for lo, hi in zip(bXlo, bXhi)]
-    
-    res = linprog(c, A_ub=Aub, b_ub=bub, bounds=bX)
-    
-    success = res.success
-    if success:
-        battOpt = res.x[:N] + res.x[N:2*N]
+        ind = bHi < 0.0
+        if np.any(ind):
+            bHi[ind] = 0.0
     else:
-        battOpt = np.zeros((N,))
-    
-    return battOpt, success
+        sumahi = suma.copy()
+        sumahi[sumahi > 0.0] = 0.0    
+        bHi = np.min(np.column_stack((-sumahi*B_effCharge, 
+                                       np.full(N, B_speedCharge*dt))), axis=1)
+        
+    return bLo, bHi
 
 
 
-def battOptAbsPeaksLosses(cons, supp, Pmax, E0, B_params, dt, conditions=None):
-    B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
-                         B_speedCharge, B_speedDischarge = B_params
-    
-    N = len(cons)
-    if B_cap <= 0.0:
-        return np.zeros((N,)), False
+def socMatrix(N):
+    # Stav nabití: s[k] - s[k-1] - xp[k] - xn[k] = 0, s[-1] = E0
+    return sparse.eye(N, format='csr') - sparse.eye(N, k=-1, format='csr')
 
-    lp = 1/B_effCharge
-    ln = B_effDischarge
 
-    c = np.zeros(2*N+1)
-    c[-1] = 1
-    suma = cons+supp
-    
-    I = np.eye(N)
-    # Z = np.zeros((N,N))
-    T = np.tri(N)
+def socRhs(N, E0):
+    b = np.zeros(N)
+    b[0] = E0
+    return b
 
-    
-    bub0 = suma
-    bub1 =  np.full((N,), B_cap*B_max - E0)
-    bub2 = -np.full((N,), B_cap*B_min - E0)
-    
-    Aub = np.vstack((np.column_stack(( lp*I,   ln*I, -np.ones(N))), 
-                     np.column_stack((-lp*I,  -ln*I, -np.ones(N))), 
-                     np.column_stack((    T,      T,  np.zeros(N))), 
-                     np.column_stack((   -T,     -T,  np.zeros(N)))))
-    bub = np.concatenate((-bub0, bub0, bub1, bub2))
 
-    
 
-    lims = getEpEnLimits(N, suma, Pmax, B_params, dt, conditions)
-    bXpLo, bXpHi, bXnLo, bXnHi = lims
 
-    
-    bXlo =  list(bXpLo)
-    bXlo += list(bXnLo)
-    bXlo.append(0)
+#%% Optimalizace průběhu baterie
+class BattOptLP():
+    # Předpřipravená úloha LP pro klouzavá okna stejné délky.
+    # Struktura matic závisí jen na typu optimalizace, délce okna a účinnostech baterie,
+    # pro každé okno se přepisují pouze ceny, pravé strany a meze proměnných.
+    # S highspy zůstává model v řešiči a další okno startuje z báze předchozího řešení.
+    
+    def __init__(self, optimizationType, N, B_params, dt, conditions=None, warmStart=True):
+        B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
+                             B_speedCharge, B_speedDischarge = B_params
+
+        if optimizationType not in (0, 1, 2):
+            raise ValueError('Neznámý typ optimalizace pro LP: ' + str(optimizationType))
+
+        self.optimizationType = optimizationType
+        self.N = N
+        self.B_params = B_params
+        self.dt = dt
+        self.conditions = conditions
+        
+        lp = 1/B_effCharge
+        ln = B_effDischarge
+        
+        I = sparse.eye(N, format='csr')
+        Z = sparse.csr_matrix((N, N))
+        o = sparse.csr_matrix(np.ones((N, 1)))
+        
+        if optimizationType == 0:
+            # Proměnné: [xp, xn, odběr, dodávka, stav nabití]
+            nX = 5*N
+            self.iSoc = 4*N
+            A = sparse.vstack((sparse.hstack(( lp*I, ln*I, -I, -I,            Z)), 
+                               sparse.hstack((   -I,   -I,  Z,  Z, socMatrix(N)))))
+            eq = np.ones(2*N, dtype=bool)
+            
+            self.c = np.zeros(nX)
+            self.xLo = np.concatenate((np.zeros(2*N), np.zeros(N), np.full(N, -np.inf), np.full(N, B_cap*B_min)))
+            self.xHi = np.concatenate((np.zeros(2*N), np.full(N, np.inf), np.zeros(N), np.full(N, B_cap*B_max)))
+        else:
+            # Proměnné: [xp, xn, stav nabití, špička]
+            nX = 3*N+1
+            self.iSoc = 2*N
+            if optimizationType == 1:
+                A = sparse.vstack((sparse.hstack(( lp*I,  ln*I,            Z, -o)), 
+                                   sparse.hstack((   -I,    -I, socMatrix(N), 0*o))))
+                eq = np.concatenate((np.zeros(N, dtype=bool), np.ones(N, dtype=bool)))
+            else:
+                A = sparse.vstack((sparse.hstack(( lp*I,  ln*I,            Z, -o)), 
+                                   sparse.hstack((-lp*I, -ln*I,            Z, -o)), 
+                                   sparse.hstack((   -I,    -I, socMatrix(N), 0*o))))
+                eq = np.concatenate((np.zeros(2*N, dtype=bool), np.ones(N, dtype=bool)))
+            
+            self.c = np.zeros(nX)
+            self.c[-1] = 1
+            self.xLo = np.concatenate((np.zeros(2*N), np.full(N, B_cap*B_min), [0]))
+            self.xHi = np.concatenate((np.zeros(2*N), np.full(N, B_cap*B_max), [np.inf]))
+        
+        self.A = A.tocsc()
+        self.nX = nX
+        self.eq = eq
+        self.rLo = np.where(eq, 0.0, -np.inf)
+        self.rHi = np.zeros(len(eq))
+        
+        self.Aub = self.A[~eq].tocsr() if np.any(~eq) else None
+        self.Aeq = self.A[eq].tocsr()
+        
+        self.highs = None
+        if warmStart and highspy is not None:
+            self.highs = self.initHighs()
+
+
+    def initHighs(self):
+        h = highspy.Highs()
+        h.setOptionValue('output_flag', False)
+        
+        model = highspy.HighsLp()
+        model.num_col_ = self.nX
+        model.num_row_ = len(self.eq)
+        model.col_cost_ = self.c
+        model.col_lower_ = self.xLo
+        model.col_upper_ = self.xHi
+        model.row_lower_ = self.rLo
+        model.row_upper_ = self.rHi
+        model.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        model.a_matrix_.start_ = self.A.indptr
+        model.a_matrix_.index_ = self.A.indices
+        model.a_matrix_.value_ = self.A.data
+        h.passModel(model)
+        
+        self.iCols = np.arange(self.nX, dtype=np.int32)
+        self.iRows = np.arange(len(self.eq), dtype=np.int32)
+        return h
 
-    bXhi =  list(bXpHi)
-    bXhi += list(bXnHi)
-    bXhi.append(None)
-    
-    bX = [(lo, hi) for lo, hi in zip(bXlo, bXhi)]
-    
-    
-    res = linprog(c, A_ub=Aub, b_ub=bub, bounds=bX)
-    
-    success = res.success
-    if success:
-        battOpt = res.x[:N] + res.x[N:2*N]
-    else:
-        battOpt = np.zeros((N,))
     
-    return battOpt, success
+    def update(self, price, cons, supp, Pmax, E0, fees=None, Eend=None, iEnd=None):
+        B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
+                             B_speedCharge, B_speedDischarge = self.B_params
+        N = self.N
+        suma = cons+supp
+        
+        if self.optimizationType == 0:
+            if fees:
+                feeCons, feeSupp  = fees
+            else:
+                feeCons, feeSupp = 0.0, 0.0
+
+            self.c[2*N:3*N] = price + feeCons
+            self.c[3*N:4*N] = price + feeSupp
+            
+            self.rLo[:N] = -suma
+            self.rHi[:N] = -suma
+        elif self.optimizationType == 1:
+            self.rHi[:N] = -suma
+        else:
+            self.rHi[:N] = -suma
+            self.rHi[N:2*N] = suma
+        
+        iSocRow = len(self.eq) - N
+        self.rLo[iSocRow] = E0
+        self.rHi[iSocRow] = E0
+        
+        bXpLo, bXpHi, bXnLo, bXnHi = getEpEnLimits(N, suma, Pmax, self.B_params, self.dt, self.conditions)
+        self.xLo[:N] = bXpLo
+        self.xHi[:N] = bXpHi
+        self.xLo[N:2*N] = bXnLo
+        self.xHi[N:2*N] = bXnHi
+        
+        # Volitelně pevný stav nabití na konci kroku iEnd (hranice nezávislých dnů)
+        self.xLo[self.iSoc:self.iSoc+N] = B_cap*B_min
+        self.xHi[self.iSoc:self.iSoc+N] = B_cap*B_max
+        if Eend is not None:
+            self.xLo[self.iSoc+iEnd] = Eend
+            self.xHi[self.iSoc+iEnd] = Eend
+
+
+    def solve(self, price, cons, supp, Pmax, E0, fees=None, Eend=None, iEnd=None):
+        N = self.N
+        if self.B_params[0] <= 0.0:
+            return np.zeros((N,)), False
+        
+        self.update(price, cons, supp, Pmax, E0, fees, Eend, iEnd)
+        
+        if self.highs is not None:
+            h = self.highs
+            h.changeColsCost(self.nX, self.iCols, self.c)
+            h.changeColsBounds(self.nX, self.iCols, self.xLo, self.xHi)
+            h.changeRowsBounds(len(self.eq), self.iRows, self.rLo, self.rHi)
+            h.run()
+            
+            success = h.getModelStatus() == highspy.HighsModelStatus.kOptimal
+            x = np.array(h.getSolution().col_value) if success else None
+            self.fun = h.getInfo().objective_function_value if success else np.nan
+        else:
+            res = linprog(self.c, 
+                          A_ub=self.Aub, b_ub=self.rHi[~self.eq] if self.Aub is not None else None, 
+                          A_eq=self.Aeq, b_eq=self.rHi[self.eq], 
+                          bounds=np.column_stack((self.xLo, self.xHi)))
+            success = res.success
+            x = res.x
+            self.fun = res.fun if success else np.nan
+        
+        if success:
+            battOpt = x[:N] + x[N:2*N]
+        else:
+            battOpt = np.zeros((N,))
+        
+        return battOpt, success
+
+
+
+def battOptPriceLosses(price, cons, supp, Pmax, E0, B_params, dt, fees=None, conditions=None):
+    return BattOptLP(0, len(price), B_params, dt, conditions, False).solve(price, cons, supp, Pmax, E0, fees)
+
+
+
+def battOptPeaksLosses(consPred, suppPred, Pmax, E0, B_params, dt, conditions=None):
+    N = len(consPred)
+    return BattOptLP(1, N, B_params, dt, conditions, False).solve(np.zeros(N), consPred, suppPred, Pmax, E0)
+
+
+
+def battOptAbsPeaksLosses(cons, supp, Pmax, E0, B_params, dt, conditions=None):
+    N = len(cons)
+    return BattOptLP(2, N, B_params, dt, conditions, False).solve(np.zeros(N), cons, supp, Pmax, E0)
 
 
 def battOptSumAbsPeaksLosses(cons, supp, Pmax, E0, B_params, dt, conditions=None):
@@ -285,24 +413,23 @@ def battOptSumAbsPeaksLosses(cons, supp, Pmax, E0, B_params, dt, conditions=None
     lp = 1/B_effCharge
     ln = B_effDischarge
 
-    c = np.zeros(3*N)
+    # Proměnné: [xp, xn, stav nabití, |odběr|]
+    c = np.zeros(4*N)
     c[-N:] = 1
     suma = cons+supp
     
-    I = np.eye(N)
-    Z = np.zeros((N,N))
-    T = np.tri(N)
+    I = sparse.eye(N, format='csr')
+    Z = sparse.csr_matrix((N, N))
 
     
     bub0 = suma
-    bub1 =  np.full((N,), B_cap*B_max - E0)
-    bub2 = -np.full((N,), B_cap*B_min - E0)
     
-    Aub = np.vstack((np.column_stack(( lp*I,   ln*I, -I)), 
-                     np.column_stack((-lp*I,  -ln*I, -I)), 
-                     np.column_stack((    T,      T,  Z)), 
-                     np.column_stack((   -T,     -T,  Z))))
-    bub = np.concatenate((-bub0, bub0, bub1, bub2))
+    Aub = sparse.vstack((sparse.hstack(( lp*I,  ln*I, Z, -I)), 
+                         sparse.hstack((-lp*I, -ln*I, Z, -I))), format='csr')
+    bub = np.concatenate((-bub0, bub0))
+
+    Aeq = sparse.hstack((-I, -I, socMatrix(N), Z), format='csr')
+    beq = socRhs(N, E0)
 
     
 
@@ -310,18 +437,11 @@ def battOptSumAbsPeaksLosses(cons, supp, Pmax, E0, B_params, dt, conditions=None
     bXpLo, bXpHi, bXnLo, bXnHi = lims
 
     
-    bXlo =  list(bXpLo)
-    bXlo += list(bXnLo)
-    bXlo += [0]*N
-
-    bXhi =  list(bXpHi)
-    bXhi += list(bXnHi)
-    bXhi += [None]*N
-    
-    bX = [(lo, hi) for lo, hi in zip(bXlo, bXhi)]
+    bXlo = np.concatenate((bXpLo, bXnLo, np.full(N, B_cap*B_min), np.zeros(N)))
+    bXhi = np.concatenate((bXpHi, bXnHi, np.full(N, B_cap*B_max), np.full(N, np.inf)))
     
     
-    res = linprog(c, A_ub=Aub, b_ub=bub, bounds=bX)
+    res = linprog(c, A_ub=Aub, b_ub=bub, A_eq=Aeq, b_eq=beq, bounds=np.column_stack((bXlo, bXhi)))
     
     success = res.success
     if success:
@@ -356,47 +476,26 @@ def battOptSumEnergyLosses(cons, supp, Pmax, E0, B_params, dt, typ=0, conditions
     lp = 1/B_effCharge
     ln = B_effDischarge
 
-    c = np.zeros(5*N)
-    c[-N:] = 1
-    suma = cons+supp
-    
-    I = np.eye(N)
-    Z = np.zeros((N,N))
-    T = np.tri(N)
-    
-    bub1 =  np.full((N,), B_cap*B_max - E0)
-    bub2 = -np.full((N,), B_cap*B_min - E0)
+    # Proměnné: [xp, xn, odběr, dodávka, stav nabití]
+    c = np.concatenate((np.zeros(2*N), np.full(N, cC), np.full(N, -cS), np.zeros(N)))
     
-    Aub = np.vstack((np.column_stack(( T,  T, Z, Z, Z)), 
-                     np.column_stack((-T, -T, Z, Z, Z))))
-    bub = np.concatenate((bub1, bub2))
+    I = sparse.eye(N, format='csr')
+    Z = sparse.csr_matrix((N, N))
     
-    
-    Aeq = np.vstack((np.column_stack((lp*I, ln*I, -I,    -I,     Z)), 
-                     np.column_stack((   Z,    Z,  I*cC, -I*cS, -I))))
-    beq = np.concatenate((-suma, np.zeros(N)))
+    Aeq = sparse.vstack((sparse.hstack(( lp*I, ln*I, -I, -I,            Z)), 
+                         sparse.hstack((   -I,   -I,  Z,  Z, socMatrix(N)))), format='csr')
+    beq = np.concatenate((-suma, socRhs(N, E0)))
     
     
 
     lims = getEpEnLimits(N, suma, Pmax, B_params, dt, conditions)
     bXpLo, bXpHi, bXnLo, bXnHi = lims
     
-    bXlo =  list(bXpLo)
-    bXlo += list(bXnLo)
-    bXlo += [0] * N
-    bXlo += [None] * N
-    bXlo += [None] * N
-
-    bXhi =  list(bXpHi)
-    bXhi += list(bXnHi)
-    bXhi += [None] * N
-    bXhi += [0] * N
-    bXhi += [None] * N
-    
-    bX = [(lo, hi) for lo, hi in zip(bXlo, bXhi)]
+    bXlo = np.concatenate((bXpLo, bXnLo, np.zeros(N), np.full(N, -np.inf), np.full(N, B_cap*B_min)))
+    bXhi = np.concatenate((bXpHi, bXnHi, np.full(N, np.inf), np.zeros(N), np.full(N, B_cap*B_max)))
     
     
-    res = linprog(c, A_ub=Aub, b_ub=bub, A_eq=Aeq, b_eq=beq, bounds=bX)
+    res = linprog(c, A_eq=Aeq, b_eq=beq, bounds=np.column_stack((bXlo, bXhi)))
 
     
     success = res.success
@@ -408,6 +507,296 @@ def battOptSumEnergyLosses(cons, supp, Pmax, E0, B_params, dt, typ=0, conditions
     return battOpt, success
 
 
+#%% Přesný model s binárními proměnnými
+def battOptPriceLossesMILP(price, cons, supp, Pmax, E0, B_params, dt, fees=None, conditions=None, 
+                           Eend=None, iEnd=None, timeLimit=10.0, mipGap=1e-4):
+    # Stejný model jako battOptPriceLossesAPOPT: baterie v jednom kroku jen nabíjí, nebo jen vybíjí,
+    # ztráty a poplatky závisí na znaménku. Řeší se jako MILP v HiGHS přes scipy.
+    B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
+                         B_speedCharge, B_speedDischarge = B_params
+    
+    N = len(cons)
+    if B_cap <= 0.0:
+        return np.zeros((N,)), False
+    
+    if fees:
+        feeCons, feeSupp = fees
+    else:
+        feeCons, feeSupp = 0.0, 0.0
+    
+    lp = 1/B_effCharge
+    ln = B_effDischarge
+    
+    suma = cons+supp
+    bLo, bHi = getBounds(N, suma, Pmax, B_params, dt, conditions)
+    # Meze jako float, u celočíselných parametrů baterie by sparse.diags varoval o typu int64
+    bLo = np.asarray(bLo, dtype=float)
+    bHi = np.asarray(bHi, dtype=float)
+    
+    # Proměnné: [xp, xn, odběr, dodávka, stav nabití, nabíjení (0/1), odběr (0/1)]
+    c = np.concatenate((np.zeros(2*N), price+feeCons, price+feeSupp, np.zeros(3*N)))
+    
+    I = sparse.eye(N, format='csr')
+    Z = sparse.csr_matrix((N, N))
+    # Horní odhad |odběru| pro přepínání odběr/dodávka
+    M = np.abs(suma, dtype=float) + bHi*lp - bLo*ln
+    
+    A = sparse.vstack((
+        # Bilance: odběr + dodávka - ztrátové toky baterie = spotřeba + výroba
+        sparse.hstack((-lp*I, -ln*I,  I,  I, Z, Z, Z)),
+        # Stav nabití
+        sparse.hstack((   -I,    -I,  Z,  Z, socMatrix(N), Z, Z)),
+        # xp <= bHi*z, xn >= bLo*(1-z)
+        sparse.hstack((    I,     Z,  Z,  Z, Z, -sparse.diags(bHi), Z)),
+        sparse.hstack((    Z,    -I,  Z,  Z, Z, -sparse.diags(bLo), Z)),
+        # odběr <= M*w, dodávka >= -M*(1-w)
+        sparse.hstack((    Z,     Z,  I,  Z, Z, Z, -sparse.diags(M))),
+        sparse.hstack((    Z,     Z,  Z, -I, Z, Z,  sparse.diags(M))),
+        ), format='csr')
+    
+    zero = np.zeros(N)
+    rLo = np.concatenate((suma, socRhs(N, E0), np.full(4*N, -np.inf)))
+    rHi = np.concatenate((suma, socRhs(N, E0), zero, -bLo, zero, M))
+    
+    socLo = np.full(N, B_cap*B_min)
+    socHi = np.full(N, B_cap*B_max)
+    if Eend is not None:
+        socLo[iEnd] = socHi[iEnd] = Eend
+    
+    xLo = np.concatenate((zero, bLo, zero, np.full(N, -np.inf), socLo, zero, zero))
+    xHi = np.concatenate((bHi, zero, np.full(N, np.inf), zero, socHi, np.ones(2*N)))
+    # Pokud je poplatek za dodávku nižší než za odběr, současný odběr a dodávka se nevyplatí
+    # a binární přepínač odběr/dodávka stačí uvolnit
+    integrality = np.concatenate((np.zeros(5*N), np.ones(N), np.full(N, float(feeSupp > feeCons))))
+    
+    res = milp(c, constraints=LinearConstraint(A, rLo, rHi), integrality=integrality, 
+               bounds=Bounds(xLo, xHi), options={'time_limit': timeLimit, 'mip_rel_gap': mipGap})
+    
+    # Při vypršení času se použije nejlepší nalezené řešení, za úspěšné se ale nepočítá
+    if res.x is not None:
+        battOpt = res.x[:N] + res.x[N:2*N]
+    else:
+        battOpt = np.zeros((N,))
+    
+    return battOpt, res.status == 0
+
+
+
+
+#%% Rychlá minimalizace špiček
+def peakStepLimits(p, suma, lims, B_params):
+    # Rozsah změny stavu nabití v každém kroku, aby odběr nepřekročil špičku p.
+    # Pracuje pro vektor kandidátů p najednou, tvar (len(p), N).
+    # Vrací také příznak, zda je krok pro dané p vůbec splnitelný.
+    # Meze platí pro čistou změnu stavu nabití, kterou výpočet provede (jen nabíjení, nebo jen
+    # vybíjení), tok ze sítě suma + d/B_effCharge, resp. suma + d*B_effDischarge roste s d.
+    _, _, _, B_effCharge, B_effDischarge, _, _ = B_params
+    bXpLo, bXpHi, bXnLo, bXnHi = lims
+    p = p[:, np.newaxis]
+    
+    # Meze getEpEnLimits nikdy nevyžadují současné nabíjení a vybíjení
+    dMin = bXpLo + bXnLo
+    dMax = bXpHi + bXnHi
+    
+    def inverse(grid):
+        # Změna stavu nabití, při které je tok ze sítě právě grid
+        return np.where(grid >= suma, (grid - suma)*B_effCharge, (grid - suma)/B_effDischarge)
+    
+    dHi = np.minimum(dMax, inverse(p))
+    dLo = np.broadcast_to(dMin, dHi.shape)
+    feasible = dLo <= dHi
+    
+    return dLo, dHi, feasible
+
+
+def peakFeasible(dLo, dHi, feasible, E0, Smin, Smax, Eend=None, iEnd=None, tol=1e-9):
+    # Dosažitelný interval stavu nabití bez smyčky přes kroky. Dolní mez splňuje
+    # lo[k] = max(lo[k-1] + dLo[k], Smin), což se rozvine na kumulativní součet
+    # a průběžné minimum (obdobně horní mez). Dokud lo <= hi, ořez druhou mezí nenastane.
+    if Eend is not None and iEnd < dLo.shape[1]-1:
+        i = iEnd+1
+        ok = peakFeasible(dLo[:, :i], dHi[:, :i], feasible[:, :i], E0, Smin, Smax, Eend, iEnd, tol)
+        return ok & peakFeasible(dLo[:, i:], dHi[:, i:], feasible[:, i:], Eend, Smin, Smax, tol=tol)
+    
+    S = np.cumsum(dLo, axis=1)
+    T = np.cumsum(dHi, axis=1)
+    lo = S + np.maximum(E0, Smin - np.minimum.accumulate(S, axis=1))
+    hi = T + np.minimum(E0, Smax - np.maximum.accumulate(T, axis=1))
+    
+    ok = np.all(feasible & (lo <= hi + tol), axis=1)
+    if Eend is not None:
+        ok &= (lo[:, -1] <= Eend + tol) & (hi[:, -1] >= Eend - tol)
+    return ok
+
+
+def battOptPeaksSweep(cons, supp, Pmax, E0, B_params, dt, conditions=None, 
+                      Eend=None, iEnd=None, nCandidates=32, tol=1e-7):
+    # Přibližná alternativa k battOptPeaksLosses (typ 1), špička vychází stejná jako z LP,
+    # průběh baterie se může lišit.
+    # Nejnižší dosažitelná špička se hledá bisekcí (v každém kole nCandidates hodnot najednou),
+    # splnitelnost se ověřuje průchodem stavu nabití. Z možných průběhů se volí ten
+    # s nejmenší aktivitou baterie. V nejasných případech se použije LP.
+    B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
+                         B_speedCharge, B_speedDischarge = B_params
+    
+    N = len(cons)
+    if B_cap <= 0.0:
+        return np.zeros((N,)), False
+    
+    def fallback():
+        battLP = BattOptLP(1, N, B_params, dt, conditions, False)
+        return battLP.solve(np.zeros(N), cons, supp, Pmax, E0, None, Eend, iEnd)
+    
+    suma = cons+supp
+    lims = getEpEnLimits(N, suma, Pmax, B_params, dt, conditions)
+    Smin, Smax = B_cap*B_min, B_cap*B_max
+    
+    # Horní odhad špičky, při kterém p už nic neomezuje
+    pLo = 0.0
+    pHi = np.max(np.abs(suma)) + np.max(np.abs(lims[1]))/B_effCharge + np.max(np.abs(lims[2]))*B_effDischarge + 1.0
+    
+    # První kolo zkouší i samotné meze intervalu
+    args = (E0, Smin, Smax, Eend, iEnd)
+    p = np.linspace(pLo, pHi, nCandidates+1)
+    ok = peakFeasible(*peakStepLimits(p, suma, lims, B_params), *args)
+    if not ok[-1]:
+        return fallback()
+    
+    while True:
+        iOk = np.argmax(ok)
+        pLo, pHi = (p[iOk-1] if iOk > 0 else pLo), p[iOk]
+        if pHi - pLo <= tol*max(1.0, pHi):
+            break
+        p = np.linspace(pLo, pHi, nCandidates+1)[1:]
+        ok = peakFeasible(*peakStepLimits(p, suma, lims, B_params), *args)
+    
+    # Průběh pro nalezenou špičku: zpětně intervaly stavů, ze kterých lze okno dokončit,
+    # dopředu změna co nejblíž nule
+    dLo, dHi, _ = [a[0].tolist() for a in peakStepLimits(np.array([pHi]), suma, lims, B_params)]
+    
+    bLo = [Smin]*N
+    bHi = [Smax]*N
+    if Eend is not None:
+        bLo[iEnd] = bHi[iEnd] = Eend
+    for k in range(N-1, 0, -1):
+        bLo[k-1] = max(bLo[k-1], bLo[k] - dHi[k])
+        bHi[k-1] = min(bHi[k-1], bHi[k] - dLo[k])
+    
+    battOpt = [0.0]*N
+    charge = E0
+    for k in range(N):
+        lo = max(dLo[k], bLo[k] - charge)
+        hi = min(dHi[k], bHi[k] - charge)
+        if lo > hi + 1e-6*max(1.0, B_cap):
+            return fallback()
+        battOpt[k] = min(max(0.0, lo), hi)
+        charge += battOpt[k]
+    
+    return np.array(battOpt), True
+
+
+
+#%% Klouzavá optimalizace po oknech
+def battOptWindows(segments, optimizationType, N, B_params, Pmax, dt, fees=None, conditions=None, 
+                   simulation=False, Eend=None, iEnd=None, solver='lp', 
+                   timeLimit=10.0, mipGap=1e-4, execute=None, onWindow=None):
+    # Úseky jsou na sobě nezávislé: [(E0, [(i0, price, consPred, suppPred, consReal, suppReal), ...]), ...]
+    # Okna uvnitř úseku na sebe navazují, každé startuje ze stavu nabití
+    # předchozího okna v hodině před svým začátkem.
+    # execute - prediktivní řízení: ze simulace plánu se použije jen úsek do začátku dalšího okna
+    # (poslední okno úseku celé), další okno startuje ze skutečného stavu nabití. Okna se ke konci
+    # horizontu zkracují, předpřipravená úloha LP je pro každou délku okna (N je výchozí délka).
+    # onWindow(podíl) - průběh výpočtu po oknech.
+    # Pro typ 1 lze špičku hledat bisekcí (solver='bisekce'), ostatní typy vždy řeší LP, resp. MILP.
+    # Typ 3 je přesný model s binárními proměnnými (MILP), timeLimit [s] a mipGap platí pro jedno okno.
+    _, _, _, B_effCharge, B_effDischarge, _, _ = B_params
+    
+    useSweep = optimizationType == 1 and solver == 'bisekce'
+    
+    if optimizationType in (0, 1, 2) and not useSweep:
+        battLPs = {N: BattOptLP(optimizationType, N, B_params, dt, conditions)}
+    
+    nWindows = sum(len(windows) for _, windows in segments)
+    done = 0
+    
+    results = []
+    for E0, windows in segments:
+        res = []
+        i0prev = None
+        for k, (i0, price, consPred, suppPred, consReal, suppReal) in enumerate(windows):
+            if i0prev is None:
+                Ebat = E0
+            else:
+                Ebat = res[-1][1][i0-1-i0prev]
+            
+            if useSweep:
+                battPred, success = battOptPeaksSweep(consPred, suppPred, Pmax, Ebat, B_params, dt, 
+                                                      conditions, Eend, iEnd)
+            elif optimizationType in (0, 1, 2):
+                battLP = battLPs.get(len(price))
+                if battLP is None:
+                    battLP = battLPs[len(price)] = BattOptLP(optimizationType, len(price), B_params, dt, conditions)
+                battPred, success = battLP.solve(price, consPred, suppPred, Pmax, Ebat, fees, Eend, iEnd)
+            else:
+                battPred, success = battOptPriceLossesMILP(price, consPred, suppPred, Pmax, Ebat, B_params, dt, 
+                                                           fees, conditions, Eend, iEnd, timeLimit, mipGap)
+            
+            if simulation:
+                n = windows[k+1][0] - i0 if execute and k < len(windows)-1 else len(battPred)
+                battReal, battRestCharge = batteryRealityLosses(battPred[:n], consReal[:n], suppReal[:n], 
+                                                                Pmax, Ebat, B_params, dt, conditions)
+            else:
+                battRestCharge = Ebat + np.cumsum(battPred)
+                battReal = battPred.copy()
+                battReal[battReal>0.0] = battReal[battReal>0.0]/B_effCharge
+                battReal[battReal<0.0] = battReal[battReal<0.0]*B_effDischarge
+            
+            res.append((battReal, battRestCharge, success))
+            i0prev = i0
+            
+            done += 1
+            if onWindow is not None:
+                onWindow(done/nWindows)
+        
+        results.append(res)
+    
+    return results
+
+
+def battOptWindowsPool(segments, nProcesses, progress=None, **kwargs):
+    # Nezávislé úseky se rozdělí do dávek a řeší se paralelně v procesech,
+    # výsledky se vrací ve stejném pořadí jako úseky
+    if nProcesses <= 0:
+        nProcesses = cpu_count() or 1
+    nProcesses = min(nProcesses, len(segments))
+    
+    if nProcesses <= 1:
+        # Průběh i uvnitř úseku, navazující okna jsou obvykle jeden dlouhý úsek
+        results = []
+        for step, segment in enumerate(segments):
+            onWindow = None
+            if progress is not None:
+                onWindow = lambda ratio, step=step: progress.update((step+ratio)/len(segments))
+            results += battOptWindows([segment], onWindow=onWindow, **kwargs)
+        return results
+    
+    # Několik dávek na proces kvůli vyrovnání zátěže
+    nBatches = min(len(segments), 4*nProcesses)
+    bounds = np.linspace(0, len(segments), nBatches+1).astype(int)
+    batches = [segments[b0:b1] for b0, b1 in zip(bounds[:-1], bounds[1:])]
+    
+    results = [None]*len(batches)
+    with ProcessPoolExecutor(max_workers=nProcesses) as pool:
+        futures = {pool.submit(battOptWindows, batch, **kwargs): i for i, batch in enumerate(batches)}
+        for done, future in enumerate(as_completed(futures)):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress.update((done+1)/len(batches))
+    
+    return [res for batch in results for res in batch]
+
+
+
 
 
 #%% Simulace reálného provozu
@@ -445,62 +834,141 @@ def batteryReality(battPred, consReal, suppReal, E0, B_params):
     return battReal, battRestCharge
 
 
-def batteryRealityLosses(battPred, consReal, suppReal, Pmax15, E0, B_params, dt):
+def batteryRealityLosses(battPred, consReal, suppReal, Pmax, E0, B_params, dt, conditions=None):
+    # Provedení plánu změn stavu nabití se skutečnou spotřebou a výrobou. Plán se ořízne na kapacitu
+    # a rezervu baterie a rychlost nabíjení a vybíjení, podle podmínek optimalizace i na Pmax,
+    # odběr ze sítě do baterie a dodávku z baterie do sítě (stejně jako meze v getEpEnLimits).
+    # Vrací tok baterie na straně sítě (jako plán přepočtený účinnostmi) a stav nabití po každém kroku.
+    # Pravidla ořezu odpovídají batteryRealityBatch, pro jeden plán je smyčka přes čísla rychlejší.
+    # Pmax je (-Pmax dodávky, Pmax odběru). Dřívější skalární Pmax15 omezuje jen odběr, a to vždy.
     decisionLimit = 0.001
     
     B_cap, B_max, B_min, B_effCharge, B_effDischarge, \
                          B_speedCharge, B_speedDischarge = B_params
-
     
-    battReal = np.zeros_like(battPred)
-    battRestCharge = np.zeros_like(battPred)
+    if np.isscalar(Pmax):
+        Pmax = (-np.inf, Pmax)
+        if conditions is None:
+            conditions = (True, True, False)
+    
+    if conditions:
+        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot = conditions
+    else:
+        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot = True, True, True
+    
+    Emin, Emax = B_cap*B_min, B_cap*B_max
+    
+    battReal = np.zeros(len(battPred))
+    battRestCharge = np.zeros(len(battPred))
 
     charge = E0
     for i in range(len(battReal)):
+        suma = consReal[i]+suppReal[i]
+        
         if   battPred[i] >= decisionLimit*B_cap:
-            if battPred[i] + charge <= B_cap*B_max:
-                toBatt = battPred[i]
-            else:
-                toBatt = B_cap*B_max - charge
-
+            toBatt = battPred[i]
             
-            # Nesmím překročit Pmax
-            if toBatt/B_effCharge + consReal[i]+suppReal[i] > Pmax15*dt:
-                toBatt = (Pmax15*dt - consReal[i]+suppReal[i])*B_effCharge
-
-                # Pokusí se redukovat max, i když podle plánu měl právě sosat
-                if toBatt/B_effDischarge < B_cap*B_min - charge: 
-                    toBatt = B_cap*B_min - charge
-
-            # Nesmím překročit kapacitu baterie
-            if toBatt + charge > B_cap*B_max:
-                toBatt = B_cap*B_max - charge
+            # Bez odběru ze sítě do baterie se nabíjí jen z přebytku výroby
+            if not allowNet2Batt:
+                toBatt = min(toBatt, max(-suma, 0.0)*B_effCharge)
             
-            if toBatt >= 0.0:
-                battReal[i] = toBatt/B_effCharge
-            else:
-                battReal[i] = toBatt/B_effDischarge
-            charge += toBatt
+            # Nesmím překročit Pmax, případně se vybíjí, aby se odběr snížil
+            if not allowPmaxOvershoot and suma + toBatt/B_effCharge > Pmax[1]*dt:
+                toGrid = Pmax[1]*dt - suma
+                toBatt = toGrid*B_effCharge if toGrid >= 0.0 else toGrid/B_effDischarge
                 
         elif battPred[i] <= -decisionLimit*B_cap:
-            if battPred[i] >= (consReal[i]+suppReal[i]):
-                fromBatt = battPred[i]
-            else:
-                fromBatt = -(consReal[i]+suppReal[i])
-                
-            fromBattLoss = fromBatt/B_effDischarge
-
-            # Nesmím se dostat pod rezervu
-            if (charge + fromBattLoss) < B_cap*B_min:
-                battReal[i] = -(charge - B_cap*B_min)*B_effDischarge
-                charge = B_cap*B_min
-            else:
-                charge += fromBattLoss
-                battReal[i] = fromBatt
-
+            toBatt = battPred[i]
+            
+            # Bez dodávky z baterie do sítě se vybíjí nejvýše do pokrytí spotřeby
+            if not allowBatt2Network:
+                toBatt = max(toBatt, -max(suma, 0.0)/B_effDischarge)
+            
+            # Nesmím překročit Pmax dodávky
+            if not allowPmaxOvershoot:
+                toBatt = max(toBatt, min((Pmax[0]*dt - suma)/B_effDischarge, 0.0))
+        else:
+            toBatt = 0.0
+        
+        # Rychlost nabíjení a vybíjení, kapacita a rezerva baterie
+        toBatt = min(toBatt, B_speedCharge*dt, Emax - charge)
+        toBatt = max(toBatt, -B_speedDischarge*dt, min(Emin - charge, 0.0))
+        
+        if toBatt >= 0.0:
+            battReal[i] = toBatt/B_effCharge
+        else:
+            battReal[i] = toBatt*B_effDischarge
+        
+        charge += toBatt
         battRestCharge[i] = charge
         
     return battReal,  battRestCharge
 
 
+def batteryRealityBatch(battPred, consReal, suppReal, Pmax, E0, B_params, dt, conditions=None):
+    # Provedení plánů změn stavu nabití pro mnoho scénářů najednou (scénáře x kroky).
+    # Spotřeba, výroba i počáteční stav nabití (scénáře) se rozšíří na tvar plánů, např. jedna
+    # spotřeba pro všechny plány, nebo různé průběhy spotřeby pro Monte Carlo.
+    # Plán se ořízne na kapacitu a rezervu baterie a rychlost nabíjení a vybíjení, podle podmínek
+    # optimalizace i na Pmax, odběr ze sítě do baterie a dodávku z baterie do sítě (stejně jako meze
+    # v getEpEnLimits). Smyčka běží jen přes kroky, všechny scénáře se posouvají současně.
+    decisionLimit = 0.001
+    
+    B_cap, B_max, B_min, B_effCharge, B_effDischarge, \
+                         B_speedCharge, B_speedDischarge = B_params
+    
+    if conditions:
+        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot = conditions
+    else:
+        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot = True, True, True
+    
+    Emin, Emax = B_cap*B_min, B_cap*B_max
+    
+    # Pole po krocích (kroky x scénáře), řádek kroku je souvislý v paměti
+    battPred = np.asarray(battPred, dtype=float)
+    suma = np.asarray(consReal, dtype=float) + np.asarray(suppReal, dtype=float)
+    plan = np.ascontiguousarray(battPred.T)
+    suma = np.ascontiguousarray(np.broadcast_to(suma, battPred.shape).T)
+    
+    battReal = np.zeros_like(plan)
+    battRestCharge = np.zeros_like(plan)
+    
+    charge = np.array(np.broadcast_to(np.asarray(E0, dtype=float), battPred.shape[:1]))
+    for i in range(plan.shape[0]):
+        p = plan[i]
+        s = suma[i]
+        
+        isCharge    = p >=  decisionLimit*B_cap
+        isDischarge = p <= -decisionLimit*B_cap
+        toBatt = np.where(isCharge | isDischarge, p, 0.0)
+        
+        # Bez odběru ze sítě do baterie se nabíjí jen z přebytku výroby
+        if not allowNet2Batt:
+            toBatt = np.where(isCharge, np.minimum(toBatt, np.maximum(-s, 0.0)*B_effCharge), toBatt)
+        
+        # Bez dodávky z baterie do sítě se vybíjí nejvýše do pokrytí spotřeby
+        if not allowBatt2Network:
+            toBatt = np.where(isDischarge, np.maximum(toBatt, -np.maximum(s, 0.0)/B_effDischarge), toBatt)
+        
+        if not allowPmaxOvershoot:
+            # Nesmím překročit Pmax odběru, případně se vybíjí, aby se odběr snížil
+            toGrid = Pmax[1]*dt - s
+            over = isCharge & (s + toBatt/B_effCharge > Pmax[1]*dt)
+            toBatt = np.where(over, np.where(toGrid >= 0.0, toGrid*B_effCharge, toGrid/B_effDischarge), toBatt)
+            
+            # Nesmím překročit Pmax dodávky
+            toBatt = np.where(isDischarge, np.maximum(toBatt, np.minimum((Pmax[0]*dt - s)/B_effDischarge, 0.0)), toBatt)
+        
+        # Rychlost nabíjení a vybíjení, kapacita a rezerva baterie
+        toBatt = np.minimum(np.minimum(toBatt, B_speedCharge*dt), Emax - charge)
+        toBatt = np.maximum(np.maximum(toBatt, -B_speedDischarge*dt), np.minimum(Emin - charge, 0.0))
+        
+        battReal[i] = np.where(toBatt >= 0.0, toBatt/B_effCharge, toBatt*B_effDischarge)
+        
+        charge += toBatt
+        battRestCharge[i] = charge
+    
+    return battReal.T, battRestCharge.T
+
+
 
@@ -1,6 +1,8 @@
 import numpy as np
 from gekko import GEKKO
 
+from libs.funsProcess import getBounds
+
 # https://www.researchgate.net/figure/Relationship-between-GHI-W-m-2-and-PV-Power-Watts-determined-at-NREL_fig1_331175630
 # https://www.hukseflux.com/applications/solar-energy-pv-system-performance-monitoring/how-to-calculate-pv-performance-ratio
 # http://www.fvepanel.cz/fotovoltaicky-panel-550-wp/
@@ -9,55 +11,6 @@ from gekko import GEKKO
 
 
 
-def getBounds(N, suma, Pmax, B_params, dt, conditions=None):
-    _, _, _, B_effCharge,   B_effDischarge, \
-             B_speedCharge, B_speedDischarge = B_params
-
-    if conditions:
-        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot  = conditions
-    else:
-        allowBatt2Network, allowNet2Batt, allowPmaxOvershoot = True, True, True
-
-
-    
-    if allowBatt2Network and allowPmaxOvershoot:
-        bLo = np.full((N), -B_speedDischarge*dt)
-    elif allowBatt2Network:
-        bLo = np.max(np.column_stack(((Pmax[0]*dt - suma)/B_effDischarge, 
-                                         np.full(N, -B_speedDischarge*dt))), axis=1)
-
-        ind = bLo > 0.0
-        if np.any(ind):
-            bLo[ind] = 0.0
-
-    else:
-        sumalo = suma.copy()
-        sumalo[sumalo < 0.0] = 0.0    
-        bLo = np.max(np.column_stack((-sumalo/B_effDischarge, 
-                                       np.full(N, -B_speedDischarge*dt))), axis=1)
-        
-
-    
-    if allowNet2Batt and allowPmaxOvershoot:
-        bHi = np.full((N), B_speedCharge*dt)
-    elif allowNet2Batt:
-        bHi = np.min(np.column_stack(((Pmax[1]*dt - suma)*B_effCharge, 
-                                       np.full(N, B_speedCharge*dt))), axis=1)
-
-        ind = bHi < 0.0
-        if np.any(ind):
-            bHi[ind] = 0.0
-    else:
-        sumahi = suma.copy()
-        sumahi[sumahi > 0.0] = 0.0    
-        bHi = np.min(np.column_stack((-sumahi*B_effCharge, 
-                                       np.full(N, B_speedCharge*dt))), axis=1)
-        
-    return bLo, bHi
-
-
-
-
 #%% Optimalizace průběhu baterie
 def battOptPriceLossesAPOPT(price, cons, supp, Pmax, E0, B_params, dt, fees=None, conditions=None):
     B_cap, B_max, B_min, B_effCharge,   B_effDischarge, \
@@ -78,8 +31,6 @@ def battOptPriceLossesAPOPT(price, cons, supp, Pmax, E0, B_params, dt, fees=None
     lp = 1/B_effCharge
     ln = B_effDischarge
 
-    print(price, cons+supp, fees, E0, B_params)
-
     boundsLower, boundsUpper = getBounds(N, suma, Pmax, B_params, dt, conditions)
 
     # Initialize Model
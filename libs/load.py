@@ -1,6 +1,6 @@
 #%% Popis
 #
-# Dokáže načíst excelové soubor xls, nebo xlsx
+# Dokáže načíst excelové soubor xls, nebo xlsx, případně csv
 # Název souboru musí být ve formátu 'odberovy_diagram_xxx.xlxs', kde xxx může být cokoliv
 # Soubor musí být v nastavené složce, defaultně 'data_input/'
 # Načítá pouze první list v excelu, který musí mít minimálně dva sloupce:
@@ -12,16 +12,20 @@
 # 230513 - lze zadat více čísel diagramů oddělených čárkou, mezerou nebo středníkem
 #          vybrané diagramy se sečtou do jednoho
 # 230615 - po hodině to nějak nefakčí dobře, viz KOWAC
+# 261017 - xlsx a csv se čtou proudově po řádcích (readStream), velké exporty nezahltí paměť
+# 261017 - 15minutové diagramy se ukládají i po čtvrthodinách (consumption_15.pkl)
 
 
 #%%
 import pandas as pd
 import numpy as np
 
-from os import listdir
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import listdir, cpu_count, remove
 from os.path import isfile
 
-from libs.funsData import intersect, readExcel
+from libs.funsData import intersect, readSeries, hourlyEnergy
+from libs.funsData import stepKeys, STEP_COLUMN, QUARTER_FILE
 
 
 
@@ -29,51 +33,125 @@ from libs.funsData import intersect, readExcel
 
 def getFiles(dataPath = 'data_input/'):
     files = [f for f in listdir(dataPath) if isfile(dataPath+f)]
-    files = [f for f in files if f.split('.')[-1] in ['xls', 'xlsx']]
+    files = [f for f in files if f.split('.')[-1] in ['xls', 'xlsx', 'csv']]
     files = [f for f in files if f[:3].lower() == 'od_']
     return files
+
+
+def hourKeys(frame):
+    # Čas začátku hodiny v celých hodinách od epochy
+    return frame['Den'].to_numpy().astype('datetime64[h]').astype(np.int64) + frame['Hodina'].to_numpy() - 1
+
+
+def sumFrames(frames):
+    # Součet diagramů v časovém průniku, hodiny (čtvrthodiny) chybějící v některém diagramu se vypouštějí
+    keys = np.concatenate([stepKeys(f) for f in frames])
+    kWh  = np.concatenate([f['kWh'].to_numpy(dtype=float) for f in frames])
+    
+    unq, inv, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    sums = np.bincount(inv.ravel(), weights=kWh, minlength=len(unq))
     
+    common = counts == len(frames)
+    
+    def timeColumns(k):
+        n = 4 if STEP_COLUMN in frames[0].columns else 1
+        hour = k // n
+        cols = {'Den': (hour // 24).astype('datetime64[D]').astype(frames[0]['Den'].dtype),
+                'Hodina': (hour % 24 + 1).astype(frames[0]['Hodina'].dtype)}
+        if n > 1:
+            cols[STEP_COLUMN] = (k % n + 1).astype(frames[0][STEP_COLUMN].dtype)
+        return cols
+    
+    data = pd.DataFrame({**timeColumns(unq[common]), 'kWh': sums[common]})
+    
+    dropped = pd.DataFrame({**timeColumns(unq[~common]), 'Souboru': counts[~common]})
+    
+    return data, dropped
+
 
-def loadData(sel, dataPath = 'data_input/', outpPath = 'data_ready/', progressBar=None):
+def readFile(dataFile):
+    # Hodinová tabulka a u diagramů s krokem nejvýše 15 minut i čtvrthodinová, soubor se čte jednou
+    t, values, unit = readSeries(dataFile)
+    
+    hourly = hourlyEnergy(t, values, unit)
+    
+    step = np.median(np.diff(t))/np.timedelta64(60, 's') if len(t) > 1 else np.nan
+    quarter = hourlyEnergy(t, values, unit, 0.25) if step <= 15 else None
+    
+    return hourly, quarter
+
+
+def printDropped(dropped, nFiles, maxIntervals=10):
+    if len(dropped) == 0:
+        return
+    
+    print(' ')
+    print('Z průniku vypuštěno hodin : ' + str(len(dropped)))
+    
+    # Souvislé úseky vypuštěných hodin
+    keys = hourKeys(dropped)
+    breaks = np.where(np.diff(keys) != 1)[0] + 1
+    starts = np.concatenate(([0], breaks))
+    ends   = np.concatenate((breaks, [len(keys)])) - 1
+    
+    form = '%d.%m.%Y %H:00'
+    for i0, i1 in zip(starts[:maxIntervals], ends[:maxIntervals]):
+        t0 = keys[i0].astype('datetime64[h]').astype('datetime64[s]').item().strftime(form)
+        t1 = (keys[i1] + 1).astype('datetime64[h]').astype('datetime64[s]').item().strftime(form)
+        print('   ' + t0 + ' - ' + t1 + ' (v %d z %d diagramů)' % (dropped['Souboru'].iloc[i0], nFiles))
+    
+    if len(starts) > maxIntervals:
+        print('   ... a dalších úseků : ' + str(len(starts) - maxIntervals))
+    
+
+def loadData(sel, dataPath = 'data_input/', outpPath = 'data_ready/', progressBar=None, nProcesses=0):
     if progressBar != None: progressBar.setValue(10)
     
     frames = [None for i in range(len(sel))]
     print(' ')
-    for i, file in enumerate(sel):
-        print('Zpracovává se soubor : ' + file)
-        
-        frames[i] = readExcel(dataPath + file)
-        
-        if progressBar != None: progressBar.setValue(int(np.round(90*((i+1)/len(sel) + 0.1)/1.1)))
+    
+    if nProcesses <= 0:
+        nProcesses = cpu_count() or 1
+    nProcesses = min(nProcesses, len(sel))
+    
+    if nProcesses <= 1:
+        for i, file in enumerate(sel):
+            print('Zpracovává se soubor : ' + file)
+            
+            frames[i] = readFile(dataPath + file)
+            
+            if progressBar != None: progressBar.setValue(int(np.round(90*((i+1)/len(sel) + 0.1)/1.1)))
+    else:
+        # Sešity se čtou souběžně, pořadí diagramů zůstává podle výběru
+        with ProcessPoolExecutor(max_workers=nProcesses) as pool:
+            futures = {pool.submit(readFile, dataPath + file): i for i, file in enumerate(sel)}
+            
+            for done, future in enumerate(as_completed(futures)):
+                i = futures[future]
+                print('Zpracován soubor : ' + sel[i])
+                
+                frames[i] = future.result()
+                
+                if progressBar != None: progressBar.setValue(int(np.round(90*((done+1)/len(sel) + 0.1)/1.1)))
     
     
     #%%
+    quarters = [q for _, q in frames]
+    frames = [h for h, _ in frames]
+    
+    dropped = None
     if len(frames) == 1:
         data = frames[0]
+        dataQuarter = quarters[0]
     else:
         print(' ')
         print('Vytváří se součet diagramů v časovém průniku')
         
-    
-        ids = [None for i in range(len(frames))]
-        for i in range(len(ids)):
-            ids[i] = [(d + pd.Timedelta(h-1, 'h')).strftime('%Y%m%d%H') for d, h in zip(frames[i]['Den'], frames[i]['Hodina'])]
-    
-        
-        monolith = np.concatenate(ids)
-        unq, counts = np.unique(monolith, return_counts=True)
-        subset = unq[counts == len(ids)]
-        
-        inds = [np.intersect1d(idi, subset, return_indices=True)[1] for idi in ids]
-        
+        data, dropped = sumFrames(frames)
+        printDropped(dropped, len(frames))
         
-        for i, frame in enumerate(frames):
-            frames[i] = frame.iloc[inds[i]].reset_index(drop=True)
-        
-        
-        data = frames[0].copy()
-        for i in range(1, len(frames)):
-            data['kWh'] += frames[i]['kWh']
+        # Po čtvrthodinách jen pokud jsou všechny diagramy alespoň 15minutové
+        dataQuarter = sumFrames(quarters)[0] if all(q is not None for q in quarters) else None
     
         if progressBar != None: progressBar.setValue(95)
 
@@ -82,6 +160,12 @@ def loadData(sel, dataPath = 'data_input/', outpPath = 'data_ready/', progressBa
     #%% Save
     data.to_pickle(outpPath + 'consumption.pkl')
     
+    # Čtvrthodinová spotřeba z dřívějšího výběru nesmí zůstat
+    if dataQuarter is not None:
+        dataQuarter.to_pickle(outpPath + QUARTER_FILE)
+    elif isfile(outpPath + QUARTER_FILE):
+        remove(outpPath + QUARTER_FILE)
+    
     time = data['Den'].values
     form = '%d.%m.%Y'
     if any(time):
@@ -103,4 +187,6 @@ def loadData(sel, dataPath = 'data_input/', outpPath = 'data_ready/', progressBa
     print(' ')    
     print('Data úspěšně zpracována')    
     
+    return dropped
+    
 
@@ -3,21 +3,19 @@
 import numpy as np
 import pandas as pd
 
+from timeit import default_timer as timer
+
 from libs.progress import Progress
 
-from libs.funsData import intersect
+from libs.funsData import intersect, intersectCached, preparedKey, compactFrame, stepsPerHour, STEP_COLUMN
 
-from libs.funsProcess import battOptPriceLosses, batteryRealityLosses
-from libs.funsProcess import battOptPeaksLosses
-from libs.funsProcess import battOptAbsPeaksLosses#, battOptSumAbsPeaksLosses
+from libs.funsProcess import BattOptLP, battOptWindowsPool
 from libs.funsProcess import battOptSumEnergyLosses
-from libs.funsProcess import checkTimeline
-
-
-from libs.funsProcessGEKKO import battOptPriceLossesAPOPT
+from libs.funsProcess import timelineSegments, windowStarts, windowTable, windowCoverage
 
 
-from libs.funsCost import calculateCost, printCost, batteryCycles, energyBalance, financialBalance, costArray
+from libs.funsCost import calculateCost, printCost, batteryCycles, energyBalance, financialBalance, costArray, groupedCost
+from libs.funsCost import balanceKernel
 
 from libs.funsChart import chartDay, ChartFull
 
@@ -26,17 +24,51 @@ from libs.funsChart import chartDay, ChartFull
 
 
 
-def calculate(conf, progressBar, textLabel, infoConsole):
-    #%% Data
-    dt = 1 #hod - interval dat
+def dataSettings(conf):
+    # Parametry, na kterých závisí připravená data: složka, vnucený rok spotřeby a časové rozlišení
+    dt = conf['Optimalizace'].get('time_resolution', 1) #hod - interval dat, 1 nebo 0.25
+    dt = 0.25 if dt < 1 else 1
+    
+    return conf['Obecne']['slozka_zpracovane'], conf['Optimalizace']['vnutitrokspotreby'], dt
+
 
-    dataPath = conf['Obecne']['slozka_zpracovane']
+def prepareData(conf, dataCache=None, dataKey=None):
+    # Připravená data (průnik spotřeby, cen a počasí), klíč dat v cache a časové rozlišení.
+    # Tabulka z cache se vrací sdílená, volající ji nesmí měnit.
+    # dataKey - klíč dat spočítaný dříve pro stejná dataSettings (např. pro všechny body citlivostní
+    # studie), kontrolní součty zdrojů se pak nepočítají ani nezapisují
+    dataPath, vnutitRokSpotreby, dt = dataSettings(conf)
     
-    vnutitRokSpotreby = conf['Optimalizace']['vnutitrokspotreby']
     
+    # Připravená data se při nezměněných zdrojích načítají z cache
+    cacheDat = conf['Optimalizace'].get('cachedat', True)
+    
+    # Volající může předat paměťovou cache (get/put), např. backend mezi výpočty
+    if dataCache is not None and dataKey is None:
+        dataKey = preparedKey(dataPath, False, vnutitRokSpotreby, dt=dt)
+    data = dataCache.get(('data', dataKey)) if dataCache is not None else None
     
     # data = pd.read_pickle(dataPath + '_intersected.pkl')
-    data = intersect(dataPath, False, False, vnutitRokSpotreby)
+    if data is None:
+        if cacheDat:
+            data = intersectCached(dataPath, False, vnutitRokSpotreby, key=dataKey, dt=dt)
+        else:
+            data = intersect(dataPath, False, False, vnutitRokSpotreby, dt)
+        
+        if dataCache is not None:
+            dataCache.put(('data', dataKey), data)
+    
+    return data, dataKey, dt
+
+
+
+def calculate(conf, progressBar, textLabel, infoConsole, dataCache=None, dataKey=None):
+    #%% Data
+    data, dataKey, dt = prepareData(conf, dataCache, dataKey)
+    
+    # Výpočet přidává a přepisuje sloupce, sdílená tabulka v cache zůstává beze změny
+    if dataCache is not None:
+        data = data.copy()
     
     
     
@@ -50,6 +82,7 @@ def calculate(conf, progressBar, textLabel, infoConsole):
         # 0 - minimalizovat náklady 
         # 1 - minimalizovat špičky spotřeby
         # 2 - minimalizovat špičky spotřeby i dodávky
+        # 3 - minimalizovat náklady, přesný model bez současného nabíjení a vybíjení (MILP)
     
     
     # Podmínky optimalizace:
@@ -72,7 +105,57 @@ def calculate(conf, progressBar, textLabel, infoConsole):
         # False - použijí se skutečná data spotřeby (ve skutečnosti nebudou známá)
     
     simulaceSkutecnehoProvozu    = conf['Optimalizace']['simulaceskutecnehoprovozu']
-        # Nechat False, simulace neni doladěná a nefunguje dobře
+        # True  - plán se provede se skutečnou spotřebou a výrobou (batteryRealityLosses)
+        # False - provede se přesně plán z predikce
+    
+    mpc                          = conf['Optimalizace'].get('mpc', False)
+        # True  - prediktivní řízení: plán se přepočítává po replanovani hodinách (1, u čtvrthodin i 0.25)
+        #         ze skutečného stavu nabití na zbývající horizont dne, provede se jen krok do dalšího
+        #         přepočtu (se simulací)
+        # False - okna navazují na plán předchozího okna
+    
+    optimalizovatCeleObdobi      = conf['Optimalizace'].get('optimalizovatceleobdobi', False)
+        # True  - celé období se optimalizuje jako jedna úloha se skutečnými daty (dokonalá předpověď),
+        #         výsledek je teoretická horní mez úspor pro srovnání s denní optimalizací
+        # False - klouzavá optimalizace po oknech (standardně od 12:00 na 36 hodin, přepočet po 24 hodinách)
+    
+    nezavisleDny                 = conf['Optimalizace'].get('nezavisledny', False)
+        # True  - každý den začíná i končí (na začátku dalšího okna) na pevném stavu nabití baterie, dny jsou
+        #         na sobě nezávislé a počítají se paralelně
+        # False - stav baterie navazuje na předchozí den
+    
+    stavNabitiNaHranici          = conf['Optimalizace'].get('stavnabitinahranici', 0.5)
+        # Stav nabití baterie na hranici nezávislých dnů (podíl kapacity)
+    
+    pocetProcesu                 = conf['Optimalizace'].get('pocetprocesu', 1)
+        # Počet procesů pro paralelní výpočet nezávislých úseků, 1 - bez paralelizace (výchozí),
+        # 0 - všechna jádra (jen pokud výpočet nespouští vlastní procesy, např. backend nebo sweep)
+    
+    resic                        = conf['Optimalizace'].get('resic', 'lp')
+        # Řešič optimalizace:
+        # lp - lineární programování (všechny typy)
+        # bisekce - přibližná bisekce na výšce špičky s průchodem stavu nabití (jen typ 1, ostatní typy LP),
+        #           v nejasných případech LP
+    if resic not in ('lp', 'bisekce'):
+        raise ValueError('Neznámý řešič: ' + str(resic))
+    
+    milpCasovyLimit              = conf['Optimalizace'].get('milpcasovylimit', 10.0)
+        # Časový limit řešení jednoho okna pro typ 3 [s], po vypršení se použije nejlepší nalezené řešení
+    
+    milpMezera                   = conf['Optimalizace'].get('milpmezera', 1e-4)
+        # Relativní mezera od optima, při které se řešení typu 3 ukončí
+    
+    kompaktniPamet               = conf['Optimalizace'].get('kompaktnipamet', False)
+        # Kompaktní tabulky (float32, malé celé typy, bez samostatné kopie dat) pro dávkové výpočty
+    
+    horizont                     = conf['Optimalizace'].get('optimization_horizon', 36)
+        # Délka okna klouzavé optimalizace [h], 24 - 168
+    
+    replanovani                  = conf['Optimalizace'].get('replanovani', 24)
+        # Po kolika hodinách se plán přepočítá (nové okno), nejvýše délka okna
+    
+    hodinaPlanovani              = conf['Optimalizace'].get('hodinaplanovani', 12)
+        # Hodina začátku prvního okna dne (12 - okna od 12:00, po zveřejnění cen na další den)
     
     automatickyZobrazitDenniGraf = conf['Graf']['automatickyzobrazitdennigraf']
     
@@ -86,8 +169,10 @@ def calculate(conf, progressBar, textLabel, infoConsole):
     # Poznámky:
     # Při simulaci skutečného provozu, přepočítávat optimalizaci každou hodinu,
     # můžou se zlepšit výsledky 
-    #    - teď je to s krokem 24 hodin, vždycky od 13 hod do konce
-    #      dalšího dne (36 hodin - je známá cena)
+    #    - standardně je to s krokem 24 hodin, vždycky od 13 hod do konce
+    #      dalšího dne (36 hodin - je známá cena), nastavitelné přes
+    #      optimization_horizon, replanovani a hodinaplanovani, přepočet
+    #      každou hodinu ze skutečného stavu nabití je režim mpc
     
     
     
@@ -148,14 +233,21 @@ def calculate(conf, progressBar, textLabel, infoConsole):
     
     #%% Výkon FVE do tabulky
     PV_coef = PV_effConverter*PV_eff * PV_area1*np.round(PV_powerNom/PV_power1)
-    PV_tempCoef = 1.0 - (data['Tamb'].values - PV_tempRef)*PV_tempEffCoef
-    # Jake je otepleni panelu vykonem?
-    PV_power = -data['GHI'].values*PV_coef*PV_tempCoef
-    data['PVkWh'] = PV_power * dt
+    PmaxFVE = conf['FVE']['pmaxfve']
     
+    pvKey = ('pv', dataKey, float(PV_coef), PV_tempRef, PV_tempEffCoef, PmaxFVE, dt)
+    PV_kWh = dataCache.get(pvKey) if dataCache is not None else None
     
-    PmaxFVE = conf['FVE']['pmaxfve']
-    data.loc[data['PVkWh'] < -PmaxFVE, 'PVkWh'] = -PmaxFVE
+    if PV_kWh is None:
+        PV_tempCoef = 1.0 - (data['Tamb'].values - PV_tempRef)*PV_tempEffCoef
+        # Jake je otepleni panelu vykonem?
+        PV_power = -data['GHI'].values*PV_coef*PV_tempCoef
+        PV_kWh = np.maximum(PV_power * dt, -PmaxFVE * dt)
+        
+        if dataCache is not None:
+            dataCache.put(pvKey, PV_kWh)
+    
+    data['PVkWh'] = PV_kWh.copy()
     
     
     
@@ -167,140 +259,182 @@ def calculate(conf, progressBar, textLabel, infoConsole):
         data['Kč/kWh'] = priceFix
     
     
-    data['BkWh'] = np.nan
-    data['BkWh_charge'] = np.nan
-    Ldata = len(data)
+    # Sloupce jako pole, výsledky se zapisují do předalokovaných polí a do tabulky až nakonec
+    dataPrice = data['Kč/kWh'].to_numpy(dtype=float)
+    dataCons  =    data['kWh'].to_numpy(dtype=float)
+    dataSupp  =  data['PVkWh'].to_numpy(dtype=float)
+    
+    # Výpočet běží nad poli float64, tabulka se dál drží jen kompaktně
+    if kompaktniPamet:
+        data = compactFrame(data)
+    
+    BkWh        = np.full(len(data), np.nan)
+    BkWh_charge = np.full(len(data), np.nan)
     
     E0 = B_cap*B_min
     
-    Nhours = 36
+    # Délka okna a krok přepočtu, krok nesmí být delší než okno (hodiny by zůstaly bez plánu)
+    Nhours = int(round(min(max(horizont, 24), 168)/dt))
+    Nstep  = int(round(min(max(replanovani, dt), Nhours*dt)/dt))
     
-    ih13 = np.where(data['Hodina'] == 13)[0]
+    quarters = data[STEP_COLUMN].values if STEP_COLUMN in data.columns else None
+    iStart = windowStarts(data['Den'].values, data['Hodina'].values, Nstep*dt, hodinaPlanovani, quarters)
     
-    progress = Progress(progressBar=progressBar, textLabel=textLabel)
-    steps = range(len(ih13))
-    succ = []
-    print('')
-    for i0, step in zip(ih13, steps):
+    conditions = (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax)
     
-        i0week = data['ISOtyden'][i0]
-        i0day  = data['DenTyden'][i0]
-        if pouzitPredikciSpotreby:
-            i0last = (data['ISOtyden'] == i0week-1) & (data['DenTyden'] == i0day) & (data['Hodina'] == 13)
-        else:
-            i0last = (data['ISOtyden'] == i0week) & (data['DenTyden'] == i0day) & (data['Hodina'] == 13)
+    # Stav nabití na hranici nezávislých dnů
+    Ehranice = B_cap*min(max(stavNabitiNaHranici, B_min), B_max)
     
-        if ~np.any(i0last):
-            Ebat = E0
-            progress.update((step+1)/len(steps))
-            continue
-        else:
-            i0last = np.where(i0last)[0][0]
-        
-        indCurr = range(i0    , i0+Nhours)
-        indLast = range(i0last, i0last+Nhours)
+    if mpc:
+        simulaceSkutecnehoProvozu = True
     
-        if indCurr[-1]+1 > Ldata:
-            progress.update((step+1)/len(steps))
-            continue
-        
-        tCurr = data['t0'][indCurr].to_numpy()
-        tLast = data['t0'][indLast].to_numpy()
-        if (len(tCurr) != Nhours) or (len(tLast) != Nhours):
-            Ebat = E0
-            progress.update((step+1)/len(steps))
-            continue
+    progress = Progress(progressBar=progressBar, textLabel=textLabel)
+    succ = []
+    tOpt = timer()
+    print('')
+    if optimalizovatCeleObdobi and optimizationType in (0, 1, 2):
+        txt = 'Optimalizace celého období jako jedné úlohy (dokonalá předpověď)'
+        print(txt)
+        infoConsole.insertPlainText(txt+'\n\n')
         
-        if not checkTimeline(tCurr, dt) or not checkTimeline(tLast, dt):
-            Ebat = E0
+        # Souvislé úseky časové řady, na začátku každého úseku je baterie na E0
+        segments = timelineSegments(data['t0'].values, dt)
+        steps = range(len(segments))
+        for (i0, i1), step in zip(segments, steps):
+            price = dataPrice[i0:i1]
+            cons  =  dataCons[i0:i1]
+            supp  =  dataSupp[i0:i1]
+            
+            battLPFull = BattOptLP(optimizationType, i1-i0, B_params, dt, conditions)
+            battPred, success = battLPFull.solve(price, cons, supp, Pmax, E0, fees)
+            succ.append(success)
+            
+            battRestCharge = E0 + np.cumsum(battPred)
+            battReal = battPred.copy()
+            battReal[battReal>0.0] = battReal[battReal>0.0]/B_effCharge
+            battReal[battReal<0.0] = battReal[battReal<0.0]*B_effDischarge
+            
+            BkWh[i0:i1] = battReal
+            BkWh_charge[i0:i1] = battRestCharge
+            
             progress.update((step+1)/len(steps))
-            continue
-        
+    
+    else:
+        if optimalizovatCeleObdobi:
+            txt = 'Optimalizace celého období je k dispozici jen pro typy optimalizace 0, 1 a 2, počítá se po dnech'
+            print(txt)
+            infoConsole.insertPlainText(txt+'\n\n')
         
-        # Aktuální uroveň 
-        Ebat = data['BkWh_charge'][i0-1]
-        if np.isnan(Ebat):
-            Ebat = E0
+        # Denní okna (přepočet po 24 hodinách), zdroje predikce spotřeby (týden předem).
+        # Okna v prvním týdnu dat nemají zdroj predikce a nepočítají se.
+        predictionWeeks = 1 if pouzitPredikciSpotreby else 0
+        iStartDaily = windowStarts(data['Den'].values, data['Hodina'].values, 24, hodinaPlanovani, quarters)
         
-        # Ceny energie
-        price = data['Kč/kWh'][indCurr].values
-    
-    
-        # Predikce spotřeby a výroby
-        consPred  =   data['kWh'][indLast].values
-        suppPred  = data['PVkWh'][indCurr].values
-        if predRandCoef > 0.0:
-            suppPred *= 1 + predRandCoef*(2*(np.random.rand(len(suppPred))-0.5))
-    
-    
-        # Plán využití baterie podle predikce
-        if optimizationType == 0:
-            battPred, success = battOptPriceLosses(price, consPred, suppPred, 
-                                                   Pmax, Ebat, B_params, dt,
-                                                   fees,
-                                                   (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax))
-        elif optimizationType == 1:
-            battPred, success = battOptPeaksLosses(consPred, suppPred, 
-                                                   Pmax, Ebat, B_params, dt, 
-                                                   (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax))
-        elif optimizationType == 2:
-            battPred, success = battOptAbsPeaksLosses(consPred, suppPred, 
-                                                      Pmax, Ebat, B_params, dt, 
-                                                      (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax))
-
-        elif optimizationType == 3:
-            battPred, success = battOptPriceLossesAPOPT(price, consPred, suppPred, 
-                                                        Pmax, Ebat, B_params, dt,
-                                                        fees,
-                                                        (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax))
-
-        # elif optimizationType == 3:
-        #     battPred, success = battOptSumEnergyLosses(consPred, suppPred, 
-        #                                                Pmax, Ebat, B_params, dt,
-        #                                                0,
-        #                                                (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax))
-            
-        # elif optimizationType == 4:
-        #     battPred, success = battOptSumEnergyLosses(consPred, suppPred, 
-        #                                                Pmax, Ebat, B_params, dt,
-        #                                                1,
-        #                                                (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax))
-
-        # elif optimizationType == 5:
-        #     battPred, success = battOptSumEnergyLosses(consPred, suppPred, 
-        #                                                Pmax, Ebat, B_params, dt,
-        #                                                2,
-        #                                                (povolitDodavkyDoSiteZBaterie, povolitOdberZeSiteDoBaterie, povolitPrekroceniPmax))
-
-        else:
+        if optimizationType not in (0, 1, 2, 3):
             txt = 'Neznámý typ optimalizace!'
             print(txt)
             infoConsole.insertPlainText(txt+'\n\n')
-            break
+            iStart = iStart[:0]
+            iStartDaily = iStartDaily[:0]
         
-        succ.append(success)
+        # Vyhodnocují se řádky pokryté denními okny, aby rozsah vyhodnocení nezávisel na kroku přepočtu
+        startsDaily, sourcesDaily, validDaily = windowTable(data['t0'].values, iStartDaily, Nhours, dt, predictionWeeks)
+        startsDaily, sourcesDaily = startsDaily[validDaily], sourcesDaily[validDaily]
+        evaluated = windowCoverage(startsDaily, Nhours, len(data))
         
+        if mpc:
+            # Prediktivní řízení: plán denního okna se po Nstep krocích přepočítává ze skutečného
+            # stavu nabití na zbývající horizont (do konce denního okna), až do začátku dalšího dne
+            offsets = np.arange(0, int(round(24/dt)), Nstep)
+            starts  = (startsDaily[:, np.newaxis] + offsets).ravel()
+            sources = (sourcesDaily[:, np.newaxis] + offsets).ravel()
+            ends    = np.repeat(startsDaily + Nhours, len(offsets))
+        else:
+            # Krok přepočtu, který nedělí 24 h, doplní první a poslední denní okno každého pokrytého úseku
+            if len(iStart) and Nstep*dt != 24:
+                edges = np.diff(np.concatenate(([0], evaluated.astype(np.int8), [0])))
+                iStart = np.union1d(iStart, np.concatenate((np.where(edges == 1)[0], np.where(edges == -1)[0] - Nhours)))
+            
+            starts, sources, valid = windowTable(data['t0'].values, iStart, Nhours, dt, predictionWeeks)
+            starts, sources = starts[valid], sources[valid]
+            ends = starts + Nhours
         
-        # Využití baterie ve skutečnosti
-        if simulaceSkutecnehoProvozu:
+        # Platná okna se rozdělí na úseky. Okno navazuje na předchozí, pokud předchozí
+        # okno zapsalo stav baterie v hodině před jeho začátkem, jinak začíná na E0.
+        # Při nezávislých dnech je každé okno samostatný úsek s pevným stavem nabití na hranici dne.
+        segments = []
+        i0prev = None
+        for i0, i0last, i1 in zip(starts.tolist(), sources.tolist(), ends.tolist()):
+            i1last = i0last + i1 - i0
+            
+            # Ceny energie
+            price = dataPrice[i0:i1]
+    
+    
+            # Predikce spotřeby a výroby (výřezy jsou pohledy do dat, nesmí se měnit na místě)
+            consPred = dataCons[i0last:i1last]
+            suppPred = dataSupp[i0:i1]
+            if predRandCoef > 0.0:
+                suppPred = suppPred*(1 + predRandCoef*(2*(np.random.rand(len(suppPred))-0.5)))
+            
             # Skutečná výroba a spotřeba
-            consReal =   data['kWh'][indCurr].values
-            suppReal = data['PVkWh'][indCurr].values
-            battReal, battRestCharge = batteryRealityLosses(battPred, consReal, suppReal, Pmax, Ebat, B_params, dt)
+            if simulaceSkutecnehoProvozu:
+                consReal = dataCons[i0:i1]
+                suppReal = dataSupp[i0:i1]
+            else:
+                consReal, suppReal = None, None
+            
+            # Při prediktivním řízení navazuje jen okno nejvýše o krok přepočtu dál
+            window = (i0, price, consPred, suppPred, consReal, suppReal)
+            if nezavisleDny and not mpc:
+                segments.append((Ehranice, [window]))
+            elif i0prev is None or i0 > i0prev + (Nstep if mpc else Nhours):
+                segments.append((E0, [window]))
+            else:
+                segments[-1][1].append(window)
+            i0prev = i0
+        
+        
+        # Plán využití baterie podle predikce, nezávislé úseky paralelně
+        if nezavisleDny and not mpc:
+            EendArgs = {'Eend': Ehranice, 'iEnd': Nstep-1}
         else:
-            battRestCharge = Ebat + np.cumsum(battPred)
-            battReal = battPred.copy()
-            battReal[battReal>0.0] = battReal[battReal>0.0]/B_effCharge
-            battReal[battReal<0.0] = battReal[battReal<0.0]*B_effDischarge
-    
+            EendArgs = {}
+        
+        results = battOptWindowsPool(segments, pocetProcesu, progress, 
+                                     optimizationType=optimizationType, N=Nhours, B_params=B_params, 
+                                     Pmax=Pmax, dt=dt, fees=fees, conditions=conditions, 
+                                     simulation=simulaceSkutecnehoProvozu, 
+                                     solver=resic, 
+                                     timeLimit=float(milpCasovyLimit), mipGap=float(milpMezera), 
+                                     execute=mpc, **EendArgs)
+        
         
         # Zápis do tabulky
-        data.loc[indCurr, 'BkWh'] = battReal
-        data.loc[indCurr, 'BkWh_charge'] = battRestCharge 
+        for (_, windows), res in zip(segments, results):
+            for window, (battReal, battRestCharge, success) in zip(windows, res):
+                i0 = window[0]
+                BkWh[i0:i0+len(battReal)] = battReal
+                BkWh_charge[i0:i0+len(battReal)] = battRestCharge 
+                succ.append(success)
         
-        # Zobraz progres
-        progress.update((step+1)/len(steps))
+        BkWh[~evaluated] = np.nan
+        BkWh_charge[~evaluated] = np.nan
         
+        if not segments:
+            progress.update(1.0)
+    
+    # Doba optimalizace a přepočet na rok dat (srovnání režimů a rozlišení)
+    tOpt = timer() - tOpt
+    tOptYear = tOpt*365*24/(len(data)*dt) if len(data) else np.nan
+    txt = 'Doba optimalizace ' + '{:.2f}'.format(tOpt).replace('.',',') + ' s (' + str(len(succ)) + ' úloh), ' + \
+          'na rok dat ' + '{:.2f}'.format(tOptYear).replace('.',',') + ' s'
+    print(txt)
+    infoConsole.insertPlainText(txt+'\n\n')
+    
+    valueType = np.float32 if kompaktniPamet else float
+    data['BkWh'] = BkWh.astype(valueType, copy=False)
+    data['BkWh_charge'] = BkWh_charge.astype(valueType, copy=False)
     
     succ = np.array(succ)
     txt = 'Úpěšně zpracováno ' + '{:.1f}'.format(100*succ.sum()/len(succ)).replace('.',',') + '% optimalizačních výpočtů'
@@ -318,10 +452,23 @@ def calculate(conf, progressBar, textLabel, infoConsole):
     
     
     #%% Vyhodnocení
-    dataRed = data[~np.isnan(data['BkWh'])].reset_index(drop=True)
+    valid = ~np.isnan(BkWh)
+    dataCount = len(data)
+    
+    if kompaktniPamet and valid.all():
+        dataRed = data
+    else:
+        dataRed = data[valid].reset_index(drop=True)
     
-    dfCost, dfCostYear, dftimeStr = calculateCost(dataRed, fees, dt=dt)
-    battCycles, battCyclesYear    = batteryCycles(dataRed, B_cap, E0=E0, dt=dt)
+    # Kompaktně se vrací jen dataRed, plná tabulka se uvolní
+    if kompaktniPamet:
+        data = None
+    
+    # Všechny součty pro vyhodnocení v jednom průchodu, z polí float64
+    balance = balanceKernel(dataPrice[valid], dataCons[valid], dataSupp[valid], BkWh[valid], fees, B_cap)
+    
+    dfCost, dfCostYear, dftimeStr = calculateCost(dataRed, fees, dt=dt, balance=balance)
+    battCycles, battCyclesYear    = batteryCycles(dataRed, B_cap, E0=E0, dt=dt, balance=balance)
     
     print(' ')
     print(dftimeStr)
@@ -337,15 +484,12 @@ def calculate(conf, progressBar, textLabel, infoConsole):
     print('Počet cyklů baterie: ' + '{:.2f}'.format(battCyclesYear))
     
     
-    results = dataRed[['Den', 'DenNazev','DenTyden','DenRok','ISOtyden','Svatek']][::24]
+    results = dataRed[['Den', 'DenNazev','DenTyden','DenRok','ISOtyden','Svatek']][::24*stepsPerHour(dt)]
     results = results.reset_index(drop=True)
     
-    days = results['Den'].values
-    res = np.zeros((len(days), 4))
-    
-    for i in range(len(days)):
-        dfcost, _, _ = calculateCost(dataRed, fees, ind=dataRed['Den']==days[i])
-        res[i, :] = dfcost['Náklady (Kč)'].values
+    # Náklady po dnech najednou pro všechny dny
+    days, res = groupedCost(dataRed, fees, dataRed['Den'].values)
+    res = res[np.searchsorted(days, results['Den'].values)]
     
     results['Kč_spotřeba']         = res[:, 0]
     results['Kč_spotřeba,FVE']     = res[:, 1]
@@ -356,8 +500,8 @@ def calculate(conf, progressBar, textLabel, infoConsole):
     # Bilance energie
     dataRed['SumaNaklady_Kc'] = costArray((dataRed['BkWh']+dataRed['kWh']+dataRed['PVkWh']).values, dataRed['Kč/kWh'].values, fees)
     
-    dfEnergyForm, dfEnergyFormYear = energyBalance(dataRed, dt)
-    dfFinanceForm, dfFinanceFormYear = financialBalance(dataRed, fees, dt)
+    dfEnergyForm, dfEnergyFormYear = energyBalance(dataRed, dt, balance=balance)
+    dfFinanceForm, dfFinanceFormYear = financialBalance(dataRed, fees, dt, balance=balance)
     
     print(' ')
     print(' ')
@@ -372,6 +516,10 @@ def calculate(conf, progressBar, textLabel, infoConsole):
     print(' ')
 
     
+    if kompaktniPamet:
+        dataRed = compactFrame(dataRed)
+    
+    
     #%% Export
     if export:
         with pd.ExcelWriter(exportFile) as writer:  
@@ -381,9 +529,17 @@ def calculate(conf, progressBar, textLabel, infoConsole):
     
     return {'data':               data, 
             'dataRed':            dataRed, 
+            'dataCount':          dataCount, 
+            'dt':                 dt, 
+            'runtime':            tOpt, 
+            'runtimeYear':        tOptYear, 
+            'solves':             len(succ), 
             'battCycles':         battCycles, 
             'battCyclesYear':     battCyclesYear, 
+            'successRatio':       succ.mean() if len(succ) else np.nan, 
             'timeString':         dftimeStr, 
+            'dfCost':             dfCost, 
+            'dfCostYear':         dfCostYear, 
             'dfCostForm':         dfCostForm, 
             'dfCostFormYear':     dfCostFormYear, 
             'dfEnergyForm':       dfEnergyForm,
@@ -0,0 +1,148 @@
+import io
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from contextlib import redirect_stdout
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import cpu_count
+from timeit import default_timer as timer
+
+from libs.progress import Progress
+
+from libs.process import calculate, dataSettings, prepareData
+
+
+
+#%% Mřížka parametrů
+# Sloupce výsledků jednoho bodu (za rok), za sloupci parametrů mřížky
+RESULT_COLUMNS = ['Náklady (Kč/rok)', 'Úspora (Kč/rok)', 'Úspora baterie (Kč/rok)',
+                  'Cykly baterie (za rok)', 'Úspěšnost (%)', 'Doba optimalizace (s)']
+
+
+def sweepPoints(conf, grid):
+    # Body mřížky jako kartézský součin hodnot. Klíče ve tvaru 'Sekce.klic' jako v konfiguraci,
+    # např. {'Baterie.b_cap': [500, 1000], 'FVE.pv_powernom': [100, 200]}.
+    for key in grid:
+        section, _, name = key.partition('.')
+        if section not in conf or name not in conf[section]:
+            raise ValueError('Neznámý parametr mřížky: ' + key)
+    
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def pointConf(conf, point):
+    # Konfigurace jednoho bodu mřížky, ostatní parametry zůstávají
+    confPoint = deepcopy(conf)
+    for key, value in point.items():
+        section, _, name = key.partition('.')
+        confPoint[section][name] = value
+    
+    # Bod optimalizuje v jednom procesu, paralelně se počítají body
+    confPoint['Optimalizace']['pocetprocesu'] = 1
+    
+    return confPoint
+
+
+
+
+#%% Výpočet bodů
+class SweepCache(dict):
+    # Paměťová cache pro calculate (get/put) sdílená body mřížky v jednom procesu
+    def put(self, key, value):
+        self[key] = value
+
+
+class _Console():
+    def insertPlainText(self, text):
+        pass
+
+
+_workerCache = None
+
+
+def _initWorker(items):
+    # Připravená data se do procesu předají jednou, ne s každým bodem
+    global _workerCache
+    _workerCache = SweepCache(items)
+
+
+def _sweepPointWorker(conf, point, dataKey):
+    return sweepPoint(conf, point, _workerCache, dataKey)
+
+
+def sweepPoint(conf, point, dataCache, dataKey=None):
+    # Výpočet jednoho bodu mřížky nad připravenými daty z cache, výpisy výpočtu se potlačí.
+    # dataKey - klíč připravených dat bodu (viz sweep). Vrací řádek tabulky výsledků
+    # (parametry bodu a RESULT_COLUMNS).
+    with redirect_stdout(io.StringIO()):
+        res = calculate(pointConf(conf, point), None, None, _Console(), dataCache=dataCache, dataKey=dataKey)
+    
+    # Pouze spotřeba, spotřeba a FVE, spotřeba a baterie, spotřeba, FVE a baterie
+    cC, cCS, cCB, cCSB = res['dfCostYear']['Náklady (Kč)'].to_numpy(dtype=float)
+    
+    row = dict(point)
+    row.update(zip(RESULT_COLUMNS, [cCSB, cC - cCSB, cCS - cCSB,
+                                    res['battCyclesYear'], 100.0*res['successRatio'], res['runtime']]))
+    return row
+
+
+def sweep(conf, grid, progressBar=None, textLabel=None, infoConsole=None, dataCache=None):
+    # Citlivostní studie: výpočet pro všechny body mřížky parametrů (viz sweepPoints).
+    # Data se připraví jednou a sdílí je všechny body, body se počítají paralelně v pocetprocesu
+    # procesech (výchozí 1, 0 - všechna jádra), každý bod optimalizuje v jednom procesu.
+    # Vrací tabulku s řádkem pro každý bod v pořadí mřížky.
+    points = sweepPoints(conf, grid)
+    
+    nProcesses = int(conf['Optimalizace'].get('pocetprocesu', 1))
+    if nProcesses <= 0:
+        nProcesses = cpu_count() or 1
+    nProcesses = min(nProcesses, len(points))
+    
+    conf = deepcopy(conf)
+    conf['Export']['export'] = False
+    
+    t0 = timer()
+    
+    # Data a jejich klíč se připraví jen v hlavním procesu, jednou pro každou kombinaci parametrů
+    # dat v mřížce (např. vnutitrokspotreby). Body pak nepočítají kontrolní součty zdrojů
+    # a procesy souběžně nepřepisují jejich záznam v cache.
+    if dataCache is None:
+        dataCache = SweepCache()
+    
+    keys = {}
+    items = {}
+    pointKeys = []
+    for point in points:
+        settings = dataSettings(pointConf(conf, point))
+        if settings not in keys:
+            data, keys[settings], _ = prepareData(pointConf(conf, point), dataCache)
+            items[('data', keys[settings])] = data
+        pointKeys.append(keys[settings])
+    
+    progress = Progress(progressBar=progressBar, textLabel=textLabel)
+    rows = [None]*len(points)
+    if nProcesses <= 1:
+        for step, point in enumerate(points):
+            rows[step] = sweepPoint(conf, point, dataCache, pointKeys[step])
+            progress.update((step+1)/len(points))
+    else:
+        with ProcessPoolExecutor(max_workers=nProcesses, initializer=_initWorker, initargs=(items,)) as pool:
+            futures = {pool.submit(_sweepPointWorker, conf, point, pointKeys[i]): i for i, point in enumerate(points)}
+            for done, future in enumerate(as_completed(futures)):
+                rows[futures[future]] = future.result()
+                progress.update((done+1)/len(points))
+    
+    table = pd.DataFrame(rows, columns=list(grid) + RESULT_COLUMNS)
+    
+    runtime = timer() - t0
+    txt = 'Citlivostní studie: ' + str(len(points)) + ' bodů za ' + '{:.2f}'.format(runtime).replace('.',',') + ' s, ' + \
+          'součet doby optimalizace bodů ' + '{:.2f}'.format(np.sum(table['Doba optimalizace (s)'])).replace('.',',') + ' s'
+    print(txt)
+    if infoConsole is not None:
+        infoConsole.insertPlainText(txt+'\n\n')
+    
+    return table
@@ -0,0 +1,66 @@
+"""
+Kontrola simulace provozu baterie: batteryRealityBatch (mnoho scénářů najednou) dává pro každý
+scénář stejný tok baterie i stav nabití jako batteryRealityLosses, pro všechny kombinace podmínek.
+"""
+import sys
+import itertools
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from libs.funsProcess import batteryRealityBatch, batteryRealityLosses
+
+
+B_PARAMS = (1000.0, 0.9, 0.1, 0.95, 0.9, 300.0, 300.0)
+PMAX = (-600.0, 700.0)
+N_SCENARIOS = 50
+N_STEPS = 48
+
+
+def test_batch_matches_scalar():
+    rng = np.random.default_rng(0)
+
+    for conditions in [None] + list(itertools.product((True, False), repeat=3)):
+        # Plány i s kroky pod rozhodovací mezí, výroba v části scénářů, různé počáteční stavy
+        battPred = rng.uniform(-400, 400, (N_SCENARIOS, N_STEPS))
+        battPred[rng.random(battPred.shape) < 0.1] = 0.0005
+        cons = rng.uniform(0, 500, (N_SCENARIOS, N_STEPS))
+        supp = -rng.uniform(0, 800, (N_SCENARIOS, N_STEPS))*(rng.random((N_SCENARIOS, 1)) < 0.7)
+        E0 = rng.uniform(100, 900, N_SCENARIOS)
+
+        battReal, battRestCharge = batteryRealityBatch(battPred, cons, supp, PMAX, E0, B_PARAMS, 1, conditions)
+        assert battReal.shape == battRestCharge.shape == battPred.shape
+
+        for k in range(N_SCENARIOS):
+            real, charge = batteryRealityLosses(battPred[k], cons[k], supp[k], PMAX, E0[k], B_PARAMS, 1, conditions)
+            assert np.allclose(battReal[k], real, rtol=0, atol=1e-9), (conditions, k)
+            assert np.allclose(battRestCharge[k], charge, rtol=0, atol=1e-9), (conditions, k)
+
+        # Stav nabití zůstává mezi rezervou a maximem
+        assert battRestCharge.min() >= B_PARAMS[0]*B_PARAMS[2] - 1e-9
+        assert battRestCharge.max() <= B_PARAMS[0]*B_PARAMS[1] + 1e-9
+
+
+def test_batch_broadcasts_shared_profiles():
+    # Jedna spotřeba a výroba a jeden počáteční stav pro všechny plány
+    rng = np.random.default_rng(1)
+    battPred = rng.uniform(-400, 400, (N_SCENARIOS, N_STEPS))
+    cons = rng.uniform(0, 500, N_STEPS)
+    supp = -rng.uniform(0, 800, N_STEPS)
+
+    battReal, battRestCharge = batteryRealityBatch(battPred, cons, supp, PMAX, 500.0, B_PARAMS, 1, (True, True, False))
+
+    for k in range(N_SCENARIOS):
+        real, charge = batteryRealityLosses(battPred[k], cons, supp, PMAX, 500.0, B_PARAMS, 1, (True, True, False))
+        assert np.allclose(battReal[k], real, rtol=0, atol=1e-9)
+        assert np.allclose(battRestCharge[k], charge, rtol=0, atol=1e-9)
+
+
+if __name__ == '__main__':
+    test_batch_matches_scalar()
+    print('✓ batteryRealityBatch odpovídá batteryRealityLosses')
+    test_batch_broadcasts_shared_profiles()
+    print('✓ batteryRealityBatch se společnou spotřebou a výrobou')
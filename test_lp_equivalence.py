@@ -0,0 +1,106 @@
+"""
+Kontrola ekvivalence LP: předpřipravená řídká úloha BattOptLP (HiGHS, start z báze předchozího
+okna) dává stejnou optimální hodnotu jako původní hustá formulace s linprog pro typy 0, 1 a 2
+a všechny kombinace podmínek optimalizace.
+"""
+import sys
+import itertools
+from pathlib import Path
+
+import numpy as np
+from scipy.optimize import linprog
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from libs.funsProcess import BattOptLP, getEpEnLimits
+
+
+B_PARAMS = (1000.0, 0.9, 0.1, 0.95, 0.9, 300.0, 300.0)
+PMAX = (-600.0, 700.0)
+FEES = (0.3, -0.1)
+N = 36
+N_WINDOWS = 20
+
+
+def denseReference(optimizationType, price, cons, supp, E0, conditions):
+    # Hustá formulace jako v původních battOptPriceLosses / battOptPeaksLosses / battOptAbsPeaksLosses:
+    # stav nabití přes dolní trojúhelníkovou matici, vrací optimální hodnotu účelové funkce
+    B_cap, B_max, B_min, B_effCharge, B_effDischarge, _, _ = B_PARAMS
+    lp = 1/B_effCharge
+    ln = B_effDischarge
+    suma = cons + supp
+
+    I = np.eye(N)
+    Z = np.zeros((N, N))
+    T = np.tri(N)
+
+    bXpLo, bXpHi, bXnLo, bXnHi = getEpEnLimits(N, suma, PMAX, B_PARAMS, 1, conditions)
+    socUb = np.concatenate((np.full(N, B_cap*B_max - E0), -np.full(N, B_cap*B_min - E0)))
+
+    if optimizationType == 0:
+        # Proměnné: [xp, xn, odběr, dodávka, náklady]
+        cp = price + FEES[0]
+        cn = price + FEES[1]
+        c = np.concatenate((np.zeros(4*N), np.ones(N)))
+        Aub = np.vstack((np.column_stack(( T,  T, Z, Z, Z)),
+                         np.column_stack((-T, -T, Z, Z, Z))))
+        Aeq = np.vstack((np.column_stack((lp*I, ln*I, -I, -I, Z)),
+                         np.column_stack((   Z,    Z, np.diag(cp), np.diag(cn), -I))))
+        beq = np.concatenate((-suma, np.zeros(N)))
+        bounds = list(zip(bXpLo, bXpHi)) + list(zip(bXnLo, bXnHi)) + \
+                 [(0, None)]*N + [(None, 0)]*N + [(None, None)]*N
+        res = linprog(c, A_ub=Aub, b_ub=socUb, A_eq=Aeq, b_eq=beq, bounds=bounds)
+    else:
+        # Proměnné: [xp, xn, špička]
+        c = np.concatenate((np.zeros(2*N), [1.0]))
+        rows = [np.column_stack((lp*I, ln*I, -np.ones(N)))]
+        rhs = [-suma]
+        if optimizationType == 2:
+            rows.append(np.column_stack((-lp*I, -ln*I, -np.ones(N))))
+            rhs.append(suma)
+        rows += [np.column_stack((T, T, np.zeros(N))), np.column_stack((-T, -T, np.zeros(N)))]
+        Aub = np.vstack(rows)
+        bub = np.concatenate(rhs + [socUb])
+        bounds = list(zip(bXpLo, bXpHi)) + list(zip(bXnLo, bXnHi)) + [(0, None)]
+        res = linprog(c, A_ub=Aub, b_ub=bub, bounds=bounds)
+
+    return res.fun if res.success else np.nan
+
+
+def randomWindow(rng):
+    price = rng.normal(2.0, 1.0, N)
+    cons = rng.uniform(0, 400, N)
+    supp = -rng.uniform(0, 500, N)*(rng.random() < 0.7)
+    E0 = rng.uniform(100, 900)
+    return price, cons, supp, E0
+
+
+def test_lp_template_matches_dense_reference():
+    rng = np.random.default_rng(0)
+
+    for optimizationType in (0, 1, 2):
+        for conditions in itertools.product((True, False), repeat=3):
+            # Jedna úloha pro všechna okna, jako v klouzavé optimalizaci
+            battLP = BattOptLP(optimizationType, N, B_PARAMS, 1, conditions)
+
+            for _ in range(N_WINDOWS):
+                price, cons, supp, E0 = randomWindow(rng)
+                battPred, success = battLP.solve(price, cons, supp, PMAX, E0, FEES)
+                reference = denseReference(optimizationType, price, cons, supp, E0, conditions)
+
+                assert success == (not np.isnan(reference)), (optimizationType, conditions)
+                if not success:
+                    continue
+
+                assert np.isclose(battLP.fun, reference, rtol=1e-6, atol=1e-6), \
+                       (optimizationType, conditions, battLP.fun, reference)
+
+                soc = E0 + np.cumsum(battPred)
+                assert soc.min() >= B_PARAMS[0]*B_PARAMS[2] - 1e-6
+                assert soc.max() <= B_PARAMS[0]*B_PARAMS[1] + 1e-6
+
+
+if __name__ == '__main__':
+    test_lp_template_matches_dense_reference()
+    print('✓ BattOptLP odpovídá husté formulaci (typy 0, 1, 2)')
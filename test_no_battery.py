@@ -0,0 +1,68 @@
+"""
+Regresní kontrola výpočtu bez baterie (Baterie.b_cap = 0, referenční případ)
+Výpočet musí doběhnout, počet cyklů je NaN a varianty s baterií se rovnají variantám bez ní.
+"""
+import sys
+import io
+import contextlib
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from libs.config import readConfig
+from libs.funsCost import balanceKernel, batteryCycles
+from libs.process import calculate
+
+
+class MockProgressBar:
+    def setValue(self, val):
+        pass
+
+class MockLabel:
+    def setText(self, text):
+        pass
+
+class MockConsole:
+    def insertPlainText(self, text):
+        pass
+
+
+def test_balance_kernel_zero_capacity():
+    price = np.array([1.0, 2.0, 3.0])
+    cons = np.array([1.0, 1.0, 1.0])
+    supp = np.zeros(3)
+    batt = np.zeros(3)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        balance = balanceKernel(price, cons, supp, batt, (0.5, -0.1), 0)
+
+    assert 'cycles' in balance
+    assert np.isnan(balance['cycles'])
+
+    Ncycles, NcyclesYear = batteryCycles(None, 0, balance=balance)
+    assert np.isnan(Ncycles) and np.isnan(NcyclesYear)
+
+
+def test_calculate_without_battery():
+    conf = readConfig(str(project_root / 'user_settings' / 'default.ini'))
+    conf['Baterie']['b_cap'] = 0
+    conf['Export']['export'] = False
+
+    with contextlib.redirect_stdout(io.StringIO()), np.errstate(invalid='ignore', divide='ignore'):
+        results = calculate(conf, MockProgressBar(), MockLabel(), MockConsole())
+
+    assert np.isnan(results['battCycles'])
+
+    cost = results['dfCostYear']['Náklady (Kč)'].to_numpy(dtype=float)
+    # Pouze spotřeba = spotřeba a baterie, spotřeba a FVE = spotřeba, FVE a baterie
+    assert np.isclose(cost[0], cost[2]) and np.isclose(cost[1], cost[3])
+
+
+if __name__ == '__main__':
+    test_balance_kernel_zero_capacity()
+    print('✓ balanceKernel bez baterie')
+    test_calculate_without_battery()
+    print('✓ calculate bez baterie')
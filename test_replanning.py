@@ -0,0 +1,55 @@
+"""
+Kontrola rozsahu vyhodnocení klouzavé optimalizace: krok přepočtu (replanovani) nemění,
+které řádky se vyhodnocují, vždy jde o rozsah oken s denním přepočtem.
+"""
+import sys
+import io
+import contextlib
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from libs.config import readConfig
+from libs.process import calculate
+
+
+class MockProgressBar:
+    def setValue(self, val):
+        pass
+
+class MockLabel:
+    def setText(self, text):
+        pass
+
+class MockConsole:
+    def insertPlainText(self, text):
+        pass
+
+
+def evaluatedRows(replanovani, mpc=False):
+    conf = readConfig(str(project_root / 'user_settings' / 'default.ini'))
+    conf['Optimalizace']['replanovani'] = replanovani
+    conf['Optimalizace']['mpc'] = mpc
+    conf['Export']['export'] = False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = calculate(conf, MockProgressBar(), MockLabel(), MockConsole())
+
+    return results['dataRed']['t0'].to_numpy()
+
+
+def test_evaluated_span_independent_of_cadence():
+    daily = evaluatedRows(24)
+    assert len(daily) > 0
+
+    for replanovani, mpc in [(6, False), (5, False), (36, False), (6, True)]:
+        rows = evaluatedRows(replanovani, mpc)
+        assert np.array_equal(rows, daily), (replanovani, mpc, len(rows), len(daily))
+
+
+if __name__ == '__main__':
+    test_evaluated_span_independent_of_cadence()
+    print('✓ rozsah vyhodnocení nezávisí na kroku přepočtu')
@@ -0,0 +1,43 @@
+"""
+Kontrola volby řešiče (Optimalizace.resic): neznámá hodnota se odmítne, výpočet nesmí potichu
+přejít na LP.
+"""
+import sys
+import io
+import contextlib
+from pathlib import Path
+
+import pytest
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from libs.config import readConfig
+from libs.process import calculate
+
+
+class MockProgressBar:
+    def setValue(self, val):
+        pass
+
+class MockLabel:
+    def setText(self, text):
+        pass
+
+class MockConsole:
+    def insertPlainText(self, text):
+        pass
+
+
+def test_unknown_solver_rejected():
+    conf = readConfig(str(project_root / 'user_settings' / 'default.ini'))
+    conf['Optimalizace']['resic'] = 'dp'
+    conf['Export']['export'] = False
+
+    with contextlib.redirect_stdout(io.StringIO()), pytest.raises(ValueError, match='řešič'):
+        calculate(conf, MockProgressBar(), MockLabel(), MockConsole())
+
+
+if __name__ == '__main__':
+    test_unknown_solver_rejected()
+    print('✓ neznámý řešič se odmítne')
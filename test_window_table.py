@@ -0,0 +1,56 @@
+"""
+Kontrola tabulky oken klouzavé optimalizace (windowTable): zdroj predikce spotřeby nikdy neleží
+později než začátek okna, okna bez zdroje v minulosti (první týden dat) jsou neplatná.
+"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from libs.funsProcess import windowTable
+
+
+NHOURS = 36
+
+
+def hourlyTime(days, gapDay=None):
+    time = np.datetime64('2023-01-01T00:00') + np.arange(24*days)*np.timedelta64(1, 'h')
+    if gapDay is not None:
+        time = time[(time < time[0] + np.timedelta64(gapDay, 'D')) |
+                    (time >= time[0] + np.timedelta64(gapDay+1, 'D'))]
+    return time
+
+
+def test_prediction_source_not_later_than_window():
+    for predictionWeeks in (1, 2):
+        for gapDay in (None, 20):
+            time = hourlyTime(400, gapDay)
+            starts = np.where(time.astype('M8[h]').astype(np.int64) % 24 == 12)[0]
+
+            starts, sources, valid = windowTable(time, starts, NHOURS, 1, predictionWeeks)
+            assert valid.any()
+            assert np.all(time[sources[valid]] <= time[starts[valid]])
+            assert np.all(time[starts[valid]] - time[sources[valid]] == np.timedelta64(7*predictionWeeks, 'D'))
+
+            # Okna, pro která predikce nemá zdroj v minulých datech, se nepočítají
+            early = time[starts] < time[0] + np.timedelta64(7*predictionWeeks, 'D')
+            assert early.any() and not valid[early].any()
+
+
+def test_without_prediction_source_is_window():
+    time = hourlyTime(10)
+    starts = np.arange(12, len(time), 24)
+
+    starts, sources, valid = windowTable(time, starts, NHOURS, 1, 0)
+    assert np.array_equal(sources, starts)
+    assert np.array_equal(valid, starts + NHOURS <= len(time))
+
+
+if __name__ == '__main__':
+    test_prediction_source_not_later_than_window()
+    print('✓ zdroj predikce nikdy neleží po začátku okna')
+    test_without_prediction_source_is_window()
+    print('✓ bez predikce je zdrojem okno samo')
@@ -705,7 +705,7 @@ class Ui_MainWindow(object):
         self.comboOptType.setItemText(0, QCoreApplication.translate("MainWindow", u"Minimalizovat n\u00e1klady (LinProg)", None))
         self.comboOptType.setItemText(1, QCoreApplication.translate("MainWindow", u"Minimalizovat \u0161pi\u010dky spot\u0159eby", None))
         self.comboOptType.setItemText(2, QCoreApplication.translate("MainWindow", u"Minimalizovat \u0161pi\u010dky spot\u0159eby i dod\u00e1vky", None))
-        self.comboOptType.setItemText(3, QCoreApplication.translate("MainWindow", u"Minimalizovat n\u00e1klady (APOPT)", None))
+        self.comboOptType.setItemText(3, QCoreApplication.translate("MainWindow", u"Minimalizovat n\u00e1klady (MILP)", None))
 
         self.label_36.setText(QCoreApplication.translate("MainWindow", u"Typ optimalizace:", None))
         self.groupResults.setTitle(QCoreApplication.translate("MainWindow", u"Anal\u00fdza", None))